@@ -1,8 +1,11 @@
 from typing import Dict
 
-from fastapi import APIRouter, Path, status
+from fastapi import APIRouter, Path, Request, status
+from fastapi.responses import StreamingResponse
 
+from services.job_scheduler import job_scheduler
 from services.task import task_manager
+from services.task_events import TERMINAL_STATUSES, task_event_stream
 from utils.handler import handle_exception
 
 router = APIRouter(prefix="/task", tags=["任务管理器"])
@@ -26,11 +29,41 @@ def get_task(task_id: str = Path(..., min_length=1, description="任务ID")):
     return task
 
 
-@router.delete("/{task_id}", summary="删除指定任务", response_model=Dict[str, str])
+@router.get("/{task_id}/events", summary="订阅任务进度事件")
+def get_task_events(request: Request, task_id: str = Path(..., min_length=1, description="任务ID")):
+    """
+    以 Server-Sent Events 推送任务进度
+    首个 progress 事件为完整任务记录，之后只推送变化的字段，任务结束时推送 end 事件
+    """
+    if not task_manager.get_task(task_id):
+        handle_exception(f"task id {task_id} not found", status.HTTP_404_NOT_FOUND)
+    return StreamingResponse(task_event_stream(task_id, request.is_disconnected),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.delete("/{task_id}", summary="取消或删除指定任务", response_model=Dict[str, str])
 def delete_task(task_id: str = Path(..., min_length=1, description="任务ID")):
-    """根据任务ID删除任务"""
+    """
+    根据任务ID删除任务
+    排队中或执行中的任务先取消：不再发起新的检测，已有的检测结果不会应用到当前频道集
+    """
+    if job_scheduler.cancel(task_id):
+        task = task_manager.get_task(task_id)
+        if task is not None and task["status"] == "pending":
+            # 尚未开始执行的任务直接结束；执行中的任务由任务自身在停止检测后更新状态
+            task_manager.update_task(task_id, status="cancelled")
+        return {"message": f"task id {task_id} cancelled"}
+
+    task = task_manager.get_task(task_id)
+    if task is None:
+        handle_exception(f"任务ID {task_id} 不存在", status.HTTP_404_NOT_FOUND)
+    if task["status"] not in TERMINAL_STATUSES and not task_manager.is_local(task_id):
+        # 任务调度器只在本工作进程内有效，其他工作进程执行的任务无法从这里取消
+        handle_exception(f"任务ID {task_id} 由其他工作进程执行，只能在该进程中取消", status.HTTP_409_CONFLICT)
+
     result = task_manager.delete_task(task_id)
     if not result:
-        handle_exception(f"任务ID {task_id} 不存在", status.HTTP_404_NOT_FOUND)
+        handle_exception(f"任务ID {task_id} 正在执行，无法删除", status.HTTP_409_CONFLICT)
 
     return {"message": f"task id {task_id} deleted"}
@@ -1,9 +1,9 @@
-import re
 from typing import Tuple, Dict
 
 from core.logger_factory import LoggerFactory
 from services.channel import ChannelBaseModel
 from services.const import Const
+from utils.extinf_util import parse_extinf
 
 logger = LoggerFactory.get_logger(__name__)
 
@@ -41,7 +41,7 @@ class LiveConverter:
 
             if line.startswith('#EXTINF:'):
                 tag_content = line[8:].strip()
-                params, name = LiveConverter.parse_extinf_params(tag_content)
+                params, name = parse_extinf(tag_content)
                 channel_name = Const.get_channel(name)
                 try:
                     channel_id = params.get('id') if "id" in params else '0'
@@ -59,18 +59,7 @@ class LiveConverter:
     @staticmethod
     def parse_extinf_params(content: str) -> Tuple[Dict, str]:
         """解析EXTINF标签中的参数和频道名称"""
-        params = {}
-        name = ''
-
-        param_str, *name_parts = content.rsplit(',', 1)
-        if name_parts:
-            name = name_parts[0].strip()
-
-        param_pattern = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
-        for match in param_pattern.finditer(param_str):
-            params[match.group(1)] = match.group(2)
-
-        return params, name
+        return parse_extinf(content)
 
     def _parse_txt_channels(self, txt_data: str):
         group_title = '其他'
@@ -1,6 +1,7 @@
 from collections import defaultdict
 
 from services import category_manager
+from utils.url_util import extract_host
 
 
 class LiveMerger:
@@ -16,11 +17,7 @@ class LiveMerger:
         if url in self._host_cache:
             return self._host_cache[url]
 
-        try:
-            host = url.split("//")[1].split("/")[0]
-        except IndexError:
-            host = None
-
+        host = extract_host(url)
         self._host_cache[url] = host
         return host
 
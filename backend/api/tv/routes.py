@@ -1,19 +1,23 @@
 import re
-from typing import Optional
+from typing import Dict, Optional
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, BackgroundTasks, Body, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Body, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field, model_validator, field_validator
 from starlette import status
 
 from api.tv.converter import LiveConverter
 from api.tv.merger import LiveMerger
+from core.constants import Constants
 from core.logger_factory import LoggerFactory
 from models.channel_info import ChannelInfo, ChannelUrl
 from models.task_response import TaskResponse
 from services.channel import channel_manager
 from services.checker import ChannelChecker
+from services.job_scheduler import job_scheduler
+from services.playlist import playlist_publisher
+from services.probe_cache import probe_cache
 from services.task import task_manager
 from utils.handler import handle_exception
 from utils.parser import Parser
@@ -26,6 +30,8 @@ class SingleCheckRequest(BaseModel):
     """单个频道检查请求模型"""
     url: str = Field(..., description="频道URL")
     rule: str = Field(default="/{i}/", description="解析规则，必须包含{i}占位符")
+    probe_quality: Optional[bool] = Field(False, description="是否探测分辨率、编码、帧率和码率")
+    use_cache: Optional[bool] = Field(False, description="是否使用缓存的检测结果，默认重新检测")
 
     @field_validator('url')
     def valid_url(cls, value):
@@ -59,6 +65,9 @@ class BatchCheckRequest(BaseModel):
     size: int = Field(10, ge=1, le=1000, description="检查数量上限1000")
     is_clear: Optional[bool] = Field(True, description="是否清空已有频道数据")
     thread_size: Optional[int] = Field(20, ge=2, le=64, description="并发线程数上限50")
+    engine: Optional[str] = Field("thread", pattern="^(thread|async|process)$",
+                                  description="检测引擎[thread|async|process]")
+    probe_quality: Optional[bool] = Field(False, description="是否探测分辨率、编码、帧率和码率")
 
 
 class EpgRequest(BaseModel):
@@ -75,6 +84,9 @@ class UpdateLiveRequest(BaseModel):
     is_clear: Optional[bool] = Field(True, description="是否清空已有频道数据")
     thread_size: Optional[int] = Field(20, ge=2, le=64, description="并发线程数上限64")
     low_limit: Optional[int] = Field(5, ge=5, le=300, description="自动更新频道数量下限")
+    engine: Optional[str] = Field("thread", pattern="^(thread|async|process)$",
+                                  description="检测引擎[thread|async|process]")
+    incremental: Optional[bool] = Field(False, description="增量更新：只检测新增地址和轮换抽检的已有地址")
 
 
 class ChannelQuery(BaseModel):
@@ -95,8 +107,11 @@ def check_single_channel(request: SingleCheckRequest) -> Response:
         channel_info = ChannelInfo(request.extract_id(request.url))
         channel_info.add_url(url_info)
 
-        checker = ChannelChecker(request.url)
-        check_result = checker.check_single_with_timeout(channel_info, url_info, check_sub_m3u8=True)
+        checker = ChannelChecker(request.url, use_cache=request.use_cache, probe_quality=request.probe_quality)
+        # 交互式检测优先于排队中的批量任务执行
+        check_result = job_scheduler.run(
+            lambda cancel_event: checker.check_single_with_timeout(channel_info, url_info, check_sub_m3u8=True),
+            Constants.JOB_PRIORITY_INTERACTIVE)
         if not check_result:
             return Response(content="", media_type="text/plain")
 
@@ -110,13 +125,26 @@ def check_single_channel(request: SingleCheckRequest) -> Response:
         handle_exception("single check failed")
 
 
+@router.delete("/cache", summary="清空频道检测结果缓存", response_model=Dict[str, int])
+def clear_probe_cache():
+    """清空检测结果缓存，之后的检测全部重新探测"""
+    try:
+        return {"cleared": probe_cache.clear()}
+    except Exception as e:
+        logger.error(f"clear probe cache failed: {str(e)}", exc_info=True)
+        handle_exception("clear probe cache failed")
+
+
 @router.post("/batch", summary="批量检查频道", response_model=TaskResponse)
-def check_batch_channels(request: BatchCheckRequest, background_tasks: BackgroundTasks) -> TaskResponse:
-    """异步批量检查多个电视频道"""
+def check_batch_channels(request: BatchCheckRequest) -> TaskResponse:
+    """
+    异步批量检查多个电视频道
+    检测结果写入独立的工作频道集，任务完成后整体替换（is_clear）或合并到当前频道集
+    """
     try:
         if request.is_clear:
-            channel_manager.clear()
-            task_manager.clear()
+            task_manager.clear_finished()
+        working_set = channel_manager.create_working_set()
 
         task_id = task_manager.create_task(
             url=request.url,
@@ -125,15 +153,22 @@ def check_batch_channels(request: BatchCheckRequest, background_tasks: Backgroun
             description=f"从ID {request.start} 开始检查 {request.size} 个频道"
         )
 
-        def run_batch_check_task() -> None:
+        def run_batch_check_task(cancel_event) -> None:
             """后台运行的批量检查任务"""
             try:
                 task_manager.update_task(task_id, status="running")
                 task = task_manager.get_task(task_id)
 
-                checker = ChannelChecker(request.url, request.start, request.size)
-                success_count = checker.check_batch(threads=request.thread_size, task_status=task, check_sub_m3u8=True)
+                checker = ChannelChecker(request.url, request.start, request.size,
+                                         probe_quality=request.probe_quality,
+                                         model=working_set, cancel_event=cancel_event)
+                success_count = checker.check_batch(threads=request.thread_size, task_status=task, check_sub_m3u8=True,
+                                                    engine=request.engine)
+                if cancel_event.is_set():
+                    task_manager.update_task(task_id, status="cancelled")
+                    return
 
+                playlist_publisher.commit(working_set, replace=request.is_clear)
                 success_ids = channel_manager.channel_ids()
                 task.update({
                     "status": "completed",
@@ -143,7 +178,7 @@ def check_batch_channels(request: BatchCheckRequest, background_tasks: Backgroun
                 logger.error(f"batch check failed: {str(re)}", exc_info=True)
                 task_manager.update_task(task_id, status="error", error=str(re))
 
-        background_tasks.add_task(run_batch_check_task)
+        job_scheduler.submit(run_batch_check_task, Constants.JOB_PRIORITY_BATCH, task_id=task_id)
         return TaskResponse(data={"task_id": task_id})
     except ValueError as ve:
         handle_exception(str(ve))
@@ -153,14 +188,14 @@ def check_batch_channels(request: BatchCheckRequest, background_tasks: Backgroun
 
 
 @router.post("/update/txt", summary="自动从txt更新直播源", response_model=TaskResponse)
-def update_txt_sources(request: UpdateLiveRequest, background_tasks: BackgroundTasks) -> TaskResponse:
+def update_txt_sources(request: UpdateLiveRequest) -> TaskResponse:
     """
     自动更新直播源数据
+    直播源解析和检测都在独立的工作频道集中进行，任务完成后整体替换（is_clear）或合并到当前频道集
     """
     try:
         if request.is_clear:
-            channel_manager.clear()
-            task_manager.clear()
+            task_manager.clear_finished()
 
         # 填充默认值
         if request.url is None:
@@ -172,13 +207,13 @@ def update_txt_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
                 domain=""
             )
 
-        channel_manager.set_epg(file=request.epg.file, source=request.epg.source, domain=request.epg.domain)
+        working_set = channel_manager.create_working_set()
+        working_set.set_epg(file=request.epg.file, source=request.epg.source, domain=request.epg.domain)
 
-        parser = Parser()
+        parser = Parser(working_set)
         parser.load_remote_url_txt(request.url)
-        total_count = channel_manager.total_count()
+        total_count = working_set.total_count()
         if total_count <= request.low_limit:
-            channel_manager.clear()
             handle_exception(f"live sources count is too low: {total_count} (less than {request.low_limit})")
 
         task_id = task_manager.create_task(
@@ -188,19 +223,27 @@ def update_txt_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
             description=f"output: {request.output}"
         )
 
-        def run_update_live_task() -> None:
+        def run_update_live_task(cancel_event) -> None:
             """后台运行的批量检查任务"""
             try:
                 task_manager.update_task(task_id, status="running")
                 task = task_manager.get_task(task_id)
 
-                checker = ChannelChecker(request.url)
+                checker = ChannelChecker(request.url, model=working_set, cancel_event=cancel_event)
                 success_count = checker.update_batch_live(
                     threads=request.thread_size,
                     task_status=task,
                     check_m3u8_invalid=False,
-                    output_file=request.output
+                    engine=request.engine,
+                    incremental=request.incremental
                 )
+                if cancel_event.is_set():
+                    task_manager.update_task(task_id, status="cancelled")
+                    return
+
+                playlist_publisher.commit(working_set, replace=request.is_clear)
+                # 提交后保存，合并更新时输出文件包含合并后的全部频道
+                ChannelChecker.write_output(request.output)
                 task.update({
                     "status": "completed",
                     "result": {"success": success_count}
@@ -209,7 +252,7 @@ def update_txt_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
                 logger.error(f"update live sources task failed: {str(re)}", exc_info=True)
                 task_manager.update_task(task_id, status="error", error=str(re))
 
-        background_tasks.add_task(run_update_live_task)
+        job_scheduler.submit(run_update_live_task, Constants.JOB_PRIORITY_REFRESH, task_id=task_id)
         return TaskResponse(data={"task_id": task_id})
     except ValueError as ve:
         handle_exception(str(ve), status.HTTP_400_BAD_REQUEST)
@@ -219,14 +262,14 @@ def update_txt_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
 
 
 @router.post("/update/m3u", summary="自动从m3u更新直播源", response_model=TaskResponse)
-def update_m3u_sources(request: UpdateLiveRequest, background_tasks: BackgroundTasks) -> TaskResponse:
+def update_m3u_sources(request: UpdateLiveRequest) -> TaskResponse:
     """
     自动更新直播源数据
+    直播源解析和检测都在独立的工作频道集中进行，任务完成后整体替换（is_clear）或合并到当前频道集
     """
     try:
         if request.is_clear:
-            channel_manager.clear()
-            task_manager.clear()
+            task_manager.clear_finished()
 
         # 填充默认值
         if request.url is None:
@@ -238,13 +281,13 @@ def update_m3u_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
                 domain=""
             )
 
-        channel_manager.set_epg(file=request.epg.file, source=request.epg.source, domain=request.epg.domain)
+        working_set = channel_manager.create_working_set()
+        working_set.set_epg(file=request.epg.file, source=request.epg.source, domain=request.epg.domain)
 
-        parser = Parser()
+        parser = Parser(working_set)
         parser.load_remote_url_m3u(request.url)
-        total_count = channel_manager.total_count()
+        total_count = working_set.total_count()
         if total_count <= request.low_limit:
-            channel_manager.clear()
             handle_exception(f"live sources count is too low: {total_count} (less than {request.low_limit})")
 
         task_id = task_manager.create_task(
@@ -254,19 +297,27 @@ def update_m3u_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
             description=f"output: {request.output}"
         )
 
-        def run_update_live_task() -> None:
+        def run_update_live_task(cancel_event) -> None:
             """后台运行的批量检查任务"""
             try:
                 task_manager.update_task(task_id, status="running")
                 task = task_manager.get_task(task_id)
 
-                checker = ChannelChecker(request.url)
+                checker = ChannelChecker(request.url, model=working_set, cancel_event=cancel_event)
                 success_count = checker.update_batch_live(
                     threads=request.thread_size,
                     task_status=task,
                     check_m3u8_invalid=False,
-                    output_file=request.output
+                    engine=request.engine,
+                    incremental=request.incremental
                 )
+                if cancel_event.is_set():
+                    task_manager.update_task(task_id, status="cancelled")
+                    return
+
+                playlist_publisher.commit(working_set, replace=request.is_clear)
+                # 提交后保存，合并更新时输出文件包含合并后的全部频道
+                ChannelChecker.write_output(request.output)
                 task.update({
                     "status": "completed",
                     "result": {"success": success_count}
@@ -275,7 +326,7 @@ def update_m3u_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
                 logger.error(f"update live sources task failed: {str(re)}", exc_info=True)
                 task_manager.update_task(task_id, status="error", error=str(re))
 
-        background_tasks.add_task(run_update_live_task)
+        job_scheduler.submit(run_update_live_task, Constants.JOB_PRIORITY_REFRESH, task_id=task_id)
         return TaskResponse(data={"task_id": task_id})
     except ValueError as ve:
         handle_exception(str(ve), status.HTTP_400_BAD_REQUEST)
@@ -284,23 +335,51 @@ def update_m3u_sources(request: UpdateLiveRequest, background_tasks: BackgroundT
         handle_exception("update m3u live sources request failed")
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """弱比较 If-None-Match 与当前 ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+def _playlist_response(request: Request, fmt: str, media_type: str) -> Response:
+    """
+    输出频道列表快照：支持 ETag 协商缓存和 gzip 压缩，读取快照不等待后台检测任务
+    快照内容较大时分块流式输出，不再整体复制到单个响应中
+    """
+    snapshot = playlist_publisher.snapshot()
+    etag = snapshot.etag(fmt)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        body = snapshot.gzip_body(fmt)
+    else:
+        body = snapshot.body(fmt)
+    if len(body) > Constants.PLAYLIST_STREAM_THRESHOLD:
+        return StreamingResponse(snapshot.iter_chunks(body, Constants.PLAYLIST_STREAM_CHUNK_SIZE),
+                                 media_type=media_type, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @router.get("/show/txt", summary="获取频道列表(TXT格式)", response_class=Response)
-def get_channels_txt():
+def get_channels_txt(request: Request):
     """获取所有可用频道的TXT格式列表"""
     try:
-        content = channel_manager.to_txt_string()
-        return Response(content=content, media_type="text/plain")
+        return _playlist_response(request, "txt", "text/plain")
     except Exception as e:
         logger.error(f"obtain channel txt list failed: {str(e)}", exc_info=True)
         handle_exception("obtain channel txt list failed")
 
 
 @router.get("/show/m3u", summary="获取频道列表(M3U格式)", response_class=Response)
-def get_channels_m3u():
+def get_channels_m3u(request: Request):
     """获取所有可用频道的M3U格式列表"""
     try:
-        content = channel_manager.to_m3u_string()
-        return Response(content=content, media_type="application/vnd.apple.mpegurl")
+        return _playlist_response(request, "m3u", "application/vnd.apple.mpegurl")
     except Exception as e:
         logger.error(f"obtain channel m3u list failed: {str(e)}", exc_info=True)
         handle_exception("obtain channel m3u list failed")
@@ -361,10 +440,11 @@ def merge_live_sources(
 
 @router.post("/chr/txt", summary="检测TXT格式直播源有效性", response_model=TaskResponse)
 def check_live_sources(
-        background_tasks: BackgroundTasks,
         txt_data: str = Body(..., media_type="text/plain", min_length=1, description="待合并的TXT格式直播源数据"),
         is_clear: Optional[bool] = Query(True, description="是否清空已有频道数据"),
-        thread_size: Optional[int] = Query(20, ge=2, le=64, description="并发线程数上限64")):
+        thread_size: Optional[int] = Query(20, ge=2, le=64, description="并发线程数上限64"),
+        engine: Optional[str] = Query("thread", pattern="^(thread|async|process)$",
+                                      description="检测引擎[thread|async|process]")):
     """
     检测TXT格式直播源有效性
     """
@@ -373,11 +453,11 @@ def check_live_sources(
             handle_exception("invalidate input: empty text", status.HTTP_400_BAD_REQUEST)
 
         if is_clear:
-            channel_manager.clear()
-            task_manager.clear()
+            task_manager.clear_finished()
 
-        Parser.load_channel_txt(txt_data)
-        total_count = channel_manager.total_count()
+        working_set = channel_manager.create_working_set()
+        Parser(working_set).load_channel_txt(txt_data)
+        total_count = working_set.total_count()
         if total_count <= 0:
             handle_exception(f"invalidate input: no valid channel data found")
 
@@ -388,16 +468,22 @@ def check_live_sources(
             description=f"检查TXT直播源有效性"
         )
 
-        def run_check_live_task() -> None:
+        def run_check_live_task(cancel_event) -> None:
             """后台运行的批量检查任务"""
             try:
                 task_manager.update_task(task_id, status="running")
                 task = task_manager.get_task(task_id)
 
-                checker = ChannelChecker()
+                checker = ChannelChecker(model=working_set, cancel_event=cancel_event)
                 success_count = checker.update_batch_live(threads=thread_size,
                                                           task_status=task,
-                                                          check_m3u8_invalid=True)
+                                                          check_m3u8_invalid=True,
+                                                          engine=engine)
+                if cancel_event.is_set():
+                    task_manager.update_task(task_id, status="cancelled")
+                    return
+
+                playlist_publisher.commit(working_set, replace=is_clear)
                 task.update({
                     "status": "completed",
                     "result": {"success": success_count}
@@ -406,7 +492,7 @@ def check_live_sources(
                 logger.error(f"check live sources task failed: {str(re)}", exc_info=True)
                 task_manager.update_task(task_id, status="error", error=str(re))
 
-        background_tasks.add_task(run_check_live_task)
+        job_scheduler.submit(run_check_live_task, Constants.JOB_PRIORITY_BATCH, task_id=task_id)
         return TaskResponse(data={"task_id": task_id})
     except Exception as e:
         handle_exception(f"check live sources failed: {str(e)}")
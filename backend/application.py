@@ -4,7 +4,10 @@ import uvicorn
 from fastapi import FastAPI
 
 from core.logger_factory import LoggerFactory
+from services import category_manager
+from services.const import channel_map
 from utils.scanner import RouteScanner
+from utils.sort_util import warm_pinyin
 
 logger = LoggerFactory.get_logger(__name__)
 
@@ -26,6 +29,16 @@ class CreateApplication:
         # 扫描当前目录下的所有routes.py文件
         scanner.register_routers()
 
+        # 预热频道名称排序所需的拼音表
+        self._warm_up_pinyin()
+
+    @staticmethod
+    def _warm_up_pinyin():
+        names = [*category_manager.get_groups(), *channel_map.values()]
+        for category_info in category_manager.list_categories().values():
+            names.extend(category_info.get("channels", []))
+        logger.info(f"pinyin table warmed up with {warm_pinyin(names)} characters")
+
     def get_app(self):
         return self._app
 
@@ -11,9 +11,69 @@ class Constants:
 
     # 网络请求相关常量
     REQUEST_TIMEOUT = 5  # 网络请求超时时间（秒）
+    HTTP_POOL_CONNECTIONS = 32  # 每个会话缓存的主机连接池数量
+    HTTP_POOL_MAXSIZE = 4  # 每个主机连接池保持的连接数
+    HTTP_RETRIES = 0  # 请求失败重试次数，可通过环境变量 HTTP_RETRIES 调整
+    HTTP_RETRY_BACKOFF = 0.2  # 重试退避系数（秒）
+    DNS_CACHE_TTL = 300  # 域名解析缓存时间（秒），0 表示不缓存
+
+    # 直播源下载相关常量
+    SOURCE_FETCH_WORKERS = 8  # 同时下载的直播源数量
+    SOURCE_READ_TIMEOUT = 15  # 直播源单次读取超时时间（秒）
+    SOURCE_FETCH_TIMEOUT = 120  # 单个直播源下载解析的总时长上限（秒）
+    SOURCE_RECORDS_CACHE_SIZE = 200000  # 内存中缓存的直播源解析记录总数上限，超出时淘汰最久未使用的直播源
 
     # 线程池相关常量
     IO_INTENSITY_FACTOR = 4  # 可在2-8之间调整
+    TASK_WINDOW_FACTOR = 2  # 线程池在途任务窗口 = 线程数 * 该系数
+    TASK_LOOKAHEAD_SIZE = 1000  # 主机调度器预读的任务数
+    TASK_LOOKAHEAD_MAX_FACTOR = 8  # 任务受主机限流时预读范围最多扩大的倍数
+
+    # 检测引擎相关常量
+    CHECK_ENGINES = ("thread", "async", "process")  # thread: 线程池引擎，async: asyncio引擎，process: 多进程引擎
+    CHECK_PROCESSES = 0  # 多进程引擎的进程数，0 表示使用CPU核数，可通过环境变量 CHECK_PROCESSES 调整
+    SHARD_CHUNK_SIZE = 64  # 多进程引擎每次下发给子进程的任务数
+    SHARD_CANCEL_POLL_INTERVAL = 0.2  # 多进程引擎等待分块结果时检查任务取消的间隔（秒）
+    PLAYLIST_STREAM_THRESHOLD = 256 * 1024  # 频道列表快照超过该大小（字节）时分块流式输出
+    PLAYLIST_STREAM_CHUNK_SIZE = 64 * 1024  # 流式输出的分块大小（字节）
+    ASYNC_LIMIT_PER_HOST = 8  # asyncio引擎单主机最大并发连接数
+
+    # 主机调度相关常量
+    HOST_MAX_INFLIGHT = 4  # 单主机同时在途的检测任务数上限
+    HOST_BACKOFF_BASE = 0.5  # 主机出错后的初始退避时间（秒）
+    HOST_BACKOFF_MAX = 30  # 主机退避时间上限（秒）
+
+    # 任务管理相关常量
+    TASK_FLUSH_INTERVAL = 1.0  # 共享任务存储中进度字段合并写回的间隔（秒）
+    PROGRESS_PUBLISH_INTERVAL = 0.25  # 批量检测进度汇总写入任务记录的间隔（秒）
+    TASK_EVENT_POLL_INTERVAL = 1.0  # 事件流读取其他工作进程任务状态的间隔（秒）
+    TASK_EVENT_KEEPALIVE = 15.0  # 事件流无变化时发送保活注释的间隔（秒）
+    JOB_WORKERS = 3  # 检测任务并发执行数上限，可由环境变量 JOB_WORKERS 覆盖
+    JOB_INTERACTIVE_RESERVED = 1  # 为交互式检测保留的执行名额，后台任务不能占用
+    JOB_PRIORITY_INTERACTIVE = 0  # 任务优先级：数值越小越先执行
+    JOB_PRIORITY_BATCH = 10
+    JOB_PRIORITY_REFRESH = 20
+
+    # 增量更新相关常量
+    INCREMENTAL_SAMPLE_BUCKETS = 20  # 增量更新时已有地址分桶数，每次轮换抽检其中一个桶
+
+    # 检测结果缓存相关常量
+    PROBE_CACHE_VALID_TTL = 3 * 3600  # 有效结果缓存时间（秒）
+    PROBE_CACHE_INVALID_TTL = 30 * 60  # 无效结果缓存时间（秒）
+    PROBE_CACHE_MAX_ENTRIES = 200000  # 缓存记录数上限，超出后按最近访问时间淘汰
+    PROBE_CACHE_FLUSH_INTERVAL = 5.0  # 检测结果缓存后台落盘的间隔（秒）
+
+    # 排序相关常量
+    SORT_KEY_CACHE_SIZE = 16384  # 频道名称排序键缓存数量上限
 
     # M3U8解析相关常量
     TS_SEGMENT_TEST_COUNT = 3  # 测试TS片段数量，建议小于4个
+    VARIANT_CONCURRENCY = 3  # 单个主播放列表同时获取的子播放列表数量
+    VARIANT_FETCH_WORKERS = 16  # 子播放列表获取共用线程池大小
+    TS_SAMPLE_BYTES = 512 * 1024  # 单个TS片段范围请求读取的字节数
+    TS_CONFIDENT_BYTES = 256 * 1024  # 单个片段读取到该字节数即认为测速结果可信，停止采样
+
+    # 视频质量探测相关常量
+    QUALITY_PROBE_WORKERS = 2  # 解复用进程数，可通过环境变量 QUALITY_PROBE_WORKERS 调整
+    QUALITY_PROBE_BYTES = 384 * 1024  # 参与解复用的TS采样数据上限
+    QUALITY_PROBE_TIMEOUT = 3  # 单次探测等待时间上限（秒）
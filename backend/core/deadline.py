@@ -0,0 +1,49 @@
+import time
+from typing import Tuple
+
+
+class TimeoutException(Exception):
+    """自定义超时异常"""
+    pass
+
+
+class Deadline:
+    """
+    检测截止时间
+    各网络阶段按剩余时间设置超时，流式读取时在数据块之间检查是否到期，
+    到期后抛出 TimeoutException，检测线程随即释放
+    """
+
+    __slots__ = ("_budget", "_expires_at")
+
+    def __init__(self, budget: float):
+        self._budget = budget
+        self._expires_at = time.monotonic() + budget
+
+    @property
+    def budget(self) -> float:
+        return self._budget
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires_at
+
+    def check(self):
+        """已到期时抛出 TimeoutException"""
+        if self.expired():
+            raise TimeoutException(f"deadline of {self._budget} seconds exceeded")
+
+    def clip(self, timeout: float) -> float:
+        """将阶段超时限制在剩余时间内"""
+        self.check()
+        return min(timeout, self.remaining())
+
+    def timeout(self, connect: float, read: float) -> Tuple[float, float]:
+        """生成 requests 使用的 (连接超时, 读取超时)"""
+        return self.clip(connect), self.clip(read)
+
+    def child(self, budget: float) -> 'Deadline':
+        """创建不晚于当前截止时间的子期限"""
+        return Deadline(min(budget, self.remaining()))
@@ -0,0 +1,130 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from core.constants import Constants
+
+
+class _DnsCache:
+    """带过期时间的域名解析缓存，只用于本模块创建的 HTTP 连接，不影响进程内其他的域名解析"""
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> str:
+        """解析主机名，返回第一个地址；IP 地址原样返回"""
+        if _is_ip_address(host):
+            return host
+
+        key = (host, port)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        # 解析失败直接抛出，不缓存失败结果
+        address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                self._entries.clear()
+            self._entries[key] = (now + self._ttl, address)
+        return address
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+class _CachedDnsConnectionMixin:
+    """建立连接时使用缓存的解析结果；TLS 握手和证书校验仍使用原主机名"""
+
+    dns_cache: _DnsCache = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            self._dns_host = self.dns_cache.resolve(host, self.port)
+        except socket.gaierror:
+            # 交由 urllib3 按原主机名解析并转换为对应的异常
+            pass
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+
+
+class _CachedDnsAdapter(HTTPAdapter):
+    """连接池中的连接使用域名解析缓存的适配器"""
+
+    def __init__(self, dns_cache: _DnsCache, **kwargs):
+        mixin = {"dns_cache": dns_cache}
+        http_connection = type("CachedDnsHTTPConnection", (_CachedDnsConnectionMixin, HTTPConnection), mixin)
+        https_connection = type("CachedDnsHTTPSConnection", (_CachedDnsConnectionMixin, HTTPSConnection), mixin)
+        self._pool_classes = {
+            "http": type("CachedDnsHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http_connection}),
+            "https": type("CachedDnsHTTPSConnectionPool", (HTTPSConnectionPool,),
+                          {"ConnectionCls": https_connection}),
+        }
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+
+class HttpPool:
+    """
+    HTTP 连接池：每个工作线程复用一个 requests.Session，会话不跨线程共享
+    1. 保持长连接，同一主机的播放列表和 TS 片段请求复用连接
+    2. 按主机划分连接池并限制大小，可配置重试次数
+    3. 连接池内的域名解析结果缓存，避免重复解析同一主机
+    """
+
+    def __init__(self, pool_connections: int = Constants.HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = Constants.HTTP_POOL_MAXSIZE,
+                 retries: int = None,
+                 backoff_factor: float = Constants.HTTP_RETRY_BACKOFF,
+                 dns_ttl: float = Constants.DNS_CACHE_TTL):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._retries = retries if retries is not None else int(os.getenv("HTTP_RETRIES", Constants.HTTP_RETRIES))
+        self._backoff_factor = backoff_factor
+        self._local = threading.local()
+        self._dns_cache = _DnsCache(dns_ttl) if dns_ttl > 0 else None
+
+    def _create_session(self) -> requests.Session:
+        retry = Retry(total=self._retries, read=False, backoff_factor=self._backoff_factor,
+                      status_forcelist=(502, 504), allowed_methods=frozenset({"GET", "HEAD"}),
+                      raise_on_status=False)
+        options = dict(pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize, max_retries=retry)
+        adapter = HTTPAdapter(**options) if self._dns_cache is None else _CachedDnsAdapter(self._dns_cache, **options)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session(self) -> requests.Session:
+        """获取当前线程的会话"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._create_session()
+        return session
+
+
+http_pool = HttpPool()
@@ -0,0 +1,29 @@
+# patterns.py
+# 预编译的正则表达式，供播放列表、直播源和订阅解析的热点路径共用
+import re
+
+# EXTINF 属性：key="value"，值中允许反斜杠转义；tvg-id 等带连字符的属性名只保留最后一段（id）
+EXTINF_PARAM_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+# 媒体播放列表中的 EXTINF 频道名称：优先 tvg-name 属性，其次逗号后的显示名称
+EXTINF_NAME_PATTERN = re.compile(
+    r'^#EXTINF:\s*'
+    r'(?P<duration>-?\d+\.?\d*)\s*'  # 捕获时长
+    r'(?:tvg-name=(?P<qt1>[\'"]?)(?P<tvg_name>[^\'",#]+?)(?P=qt1)\s*)?'  # 修复括号
+    r'(?:,?\s*(?P<display_name>[^#]+?))?'  # 显示名称
+    r'\s*(?:#.*)?$',  # 注释部分
+    re.IGNORECASE | re.MULTILINE
+)
+# 判断显示名称是否有效时去除的标点
+EXTINF_NAME_STRIP_TABLE = str.maketrans('', '', ',.，。')
+
+# 主播放列表的子播放列表属性
+STREAM_INF_PATTERN = re.compile(r'^#EXT-X-STREAM-INF:(.*)$')
+BANDWIDTH_PATTERN = re.compile(r'(?:^|,)\s*BANDWIDTH=(\d+)')
+RESOLUTION_PATTERN = re.compile(r'(?:^|,)\s*RESOLUTION=(\d+)x(\d+)')
+
+# Content-Disposition 中的文件名
+CONTENT_DISPOSITION_FILENAME_PATTERN = re.compile(r'filename=(.+)')
+
+# 订阅节点名称中需要去除的内容
+SUBSCRIBE_REMOVE_PATTERN = re.compile(r'dafei\.de |-[A-Za-z\s,\. ]+- ')
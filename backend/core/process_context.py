@@ -0,0 +1,11 @@
+import multiprocessing
+from multiprocessing.context import BaseContext
+
+
+def process_context() -> BaseContext:
+    """
+    子进程启动方式：主进程中已有连接池、进度发布和任务调度等线程，fork 可能继承被持有的锁，
+    因此进程池统一使用 forkserver（不支持时使用 spawn）从干净的进程启动子进程
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
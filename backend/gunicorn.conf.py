@@ -5,7 +5,10 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 
 bind = "0.0.0.0:8001"
-workers = 1
+# 工作进程数，默认且建议为 1：频道数据、播放列表快照、检测任务调度和定时任务都只存在于各自进程内，
+# 多个进程时更新只作用于处理该请求的进程，其他进程返回的频道列表不会随之变化；
+# 只有任务状态可以通过 TASK_STORE=sqlite 在进程间共享
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
 worker_class = "uvicorn.workers.UvicornWorker"
 chdir = project_root
 preload_app = True
@@ -13,3 +16,16 @@ preload_app = True
 worker_extra_args = ["--root-path", "/api"]
 
 raw_env = [f"PYTHONPATH={project_root}", "API_PREFIX=/api"]
+
+# 多个工作进程时任务状态必须存放在共享存储中，否则查询任务可能落到不知道该任务的进程
+if workers > 1:
+    os.environ.setdefault("TASK_STORE", "sqlite")
+    raw_env.append(f"TASK_STORE={os.environ['TASK_STORE']}")
+
+
+def when_ready(server):
+    if workers > 1:
+        server.log.warning(
+            f"running with {workers} workers: channel data, playlist snapshots, the job scheduler and "
+            f"scheduled tasks are per worker and will diverge between workers; only task status is shared. "
+            f"Set GUNICORN_WORKERS=1 unless this is intended")
@@ -1,44 +1,95 @@
+import bisect
+import sys
 import threading
-from typing import List, Dict, Set
+import weakref
+from typing import Callable, List, Dict, Optional, Set
 
 from utils.sort_util import mixed_sort_key
 
 
+class _LockStripes:
+    """
+    分段锁：同一层级的对象按 id 散列到固定数量的可重入锁上，不再为每个对象单独分配锁
+    频道列表与频道信息使用各自独立的锁池，加锁顺序固定为 列表 -> 频道，不会出现交叉等待
+    """
+
+    __slots__ = ("_locks",)
+
+    def __init__(self, size: int):
+        self._locks = tuple(threading.RLock() for _ in range(size))
+
+    def for_object(self, obj) -> threading.RLock:
+        return self._locks[(id(obj) >> 4) % len(self._locks)]
+
+
+_INFO_LOCKS = _LockStripes(64)
+_LIST_LOCKS = _LockStripes(16)
+
+
+def _intern(value):
+    """驻留字符串，大量频道共享相同的分组、名称和台标时只保留一份"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class ChannelUrl:
     """
     频道地址：数据流地址和速度信息
+    url 作为哈希键始终保持不变，主播放列表解析出的子播放列表地址单独记录在 resolved_url 中
+    频道集中的地址通过 UrlRegistry 驻留，同一频道集内同一地址只有一个实例
     """
-    _instances = {}
-
-    def __new__(cls, url: str, speed=0, resolution=None):
-        if url in cls._instances:
-            instance = cls._instances[url]
-            # 只更新非默认值的属性
-            if speed != 0:
-                instance.set_speed(speed)
-            if resolution is not None:
-                instance.set_resolution(resolution)
-            return instance
-        else:
-            instance = super().__new__(cls)
-            instance.__init__(url, speed, resolution)
-            cls._instances[url] = instance
-            return instance
+    __slots__ = ("url", "speed", "resolution", "quality", "resolved_url", "_owners", "__weakref__")
 
     def __init__(self, url: str, speed=0, resolution=None):
         self.url = url
         self.speed = speed  # 单位：KB/s
         self.resolution = resolution
+        self.quality = None  # 视频质量探测结果：StreamQuality
+        self.resolved_url = None
+        self._owners = ()
 
-    def set_url(self, url: str):
-        self.url = url
+    def set_resolved_url(self, resolved_url: Optional[str]):
+        self.resolved_url = resolved_url
+
+    @property
+    def playback_url(self) -> str:
+        """实际播放地址：解析出子播放列表时使用子播放列表地址"""
+        return self.resolved_url or self.url
 
     def set_speed(self, speed):
+        old_speed = self.speed
         self.speed = round(speed, 1)
+        if self.speed != old_speed:
+            for owner_ref in self._owners:
+                owner = owner_ref()
+                if owner is not None:
+                    owner.reorder_url(self, old_speed)
+
+    def add_owner(self, owner: 'ChannelInfo'):
+        """登记包含该地址的频道，速度变化时通知其调整地址顺序"""
+        self._owners = self._alive_owners(owner) + (weakref.ref(owner),)
+
+    def remove_owner(self, owner: 'ChannelInfo'):
+        self._owners = self._alive_owners(owner)
+
+    def _alive_owners(self, exclude: 'ChannelInfo') -> tuple:
+        return tuple(ref for ref in self._owners if ref() is not None and ref() is not exclude)
 
     def set_resolution(self, resolution):
         self.resolution = resolution
 
+    def set_quality(self, quality):
+        """记录视频质量探测结果，同时更新分辨率"""
+        self.quality = quality
+        if quality is not None and quality.resolution:
+            self.set_resolution(quality.resolution)
+
+    def update_from(self, other: 'ChannelUrl'):
+        """用同一地址另一实例的检测结果更新当前实例"""
+        self.set_resolved_url(other.resolved_url)
+        self.set_resolution(other.resolution)
+        self.quality = other.quality
+        self.set_speed(other.speed)
+
     def __eq__(self, other):
         return self.url == other.url
 
@@ -46,29 +97,84 @@ class ChannelUrl:
         return hash(self.url)
 
 
+class UrlRegistry:
+    """
+    频道地址驻留表：同一频道集内同一地址只保留一个实例，检测结果对包含该地址的所有频道生效
+    每个频道集（包括检测任务的工作频道集）各自持有驻留表，工作频道集的检测不会修改正在使用的地址实例
+    驻留表只持有弱引用，频道数据清空后实例随之释放
+    """
+
+    __slots__ = ("_instances", "_lock")
+
+    def __init__(self):
+        self._instances: 'weakref.WeakValueDictionary[str, ChannelUrl]' = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, url: str) -> ChannelUrl:
+        """获取地址实例，不存在时创建"""
+        with self._lock:
+            instance = self._instances.get(url)
+            if instance is None:
+                instance = ChannelUrl(url)
+                self._instances[url] = instance
+            return instance
+
+    def adopt(self, url_info: ChannelUrl) -> ChannelUrl:
+        """登记其他频道集中的地址实例，已存在同一地址时返回当前实例"""
+        with self._lock:
+            return self._instances.setdefault(url_info.url, url_info)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._instances)
+
+
 class ChannelInfo:
     """
     频道信息，包括频道数据流地址和速度信息
     """
 
+    __slots__ = ("id", "name", "logo", "title", "urls", "_ordered_urls", "_ordered_speeds", "_on_change",
+                 "__weakref__")
+
     def __init__(self, id: str = '', name: str = None):
-        self.id = id if id != name else ''
-        self.name = name
+        self.id = _intern(id if id != name else '')
+        self.name = _intern(name)
         self.logo = None
         self.title = '其他'
         self.urls: Set[ChannelUrl] = set()
-        self._lock = threading.RLock()
+        # 按速度升序维护的地址列表及对应的速度键
+        self._ordered_urls: List[ChannelUrl] = []
+        self._ordered_speeds: List[float] = []
+        self._on_change: Optional[Callable[[], None]] = None
+
+    @property
+    def _lock(self) -> threading.RLock:
+        return _INFO_LOCKS.for_object(self)
+
+    def bind(self, on_change: Optional[Callable[[], None]]):
+        """绑定变更通知回调，频道地址增删时触发"""
+        self._on_change = on_change
+
+    def _notify(self):
+        if self._on_change is not None:
+            self._on_change()
 
     def set_logo(self, logo: str):
         if logo is not None:
-            self.logo = logo
+            self.logo = _intern(logo)
 
     def set_name(self, name: str):
-        self.name = name or f"频道-{self.id}"
+        self.name = _intern(name or f"频道-{self.id}")
 
     def add_url(self, url: ChannelUrl):
         with self._lock:
+            if url in self.urls:
+                return
             self.urls.add(url)
+            self._insert_ordered(url)
+            url.add_owner(self)
+        self._notify()
 
     def get_urls(self):
         with self._lock:
@@ -76,10 +182,48 @@ class ChannelInfo:
 
     def remove_invalid_url(self, url_info: ChannelUrl):
         with self._lock:
+            if url_info not in self.urls:
+                return
             self.urls.discard(url_info)
+            self._remove_ordered(url_info, url_info.speed)
+            url_info.remove_owner(self)
+        self._notify()
+
+    def reorder_url(self, url_info: ChannelUrl, old_speed):
+        """地址速度变化后调整其在有序列表中的位置"""
+        with self._lock:
+            if not self._remove_ordered(url_info, old_speed):
+                return
+            self._insert_ordered(url_info)
+        self._notify()
+
+    def _insert_ordered(self, url_info: ChannelUrl):
+        index = bisect.bisect_right(self._ordered_speeds, url_info.speed)
+        self._ordered_speeds.insert(index, url_info.speed)
+        self._ordered_urls.insert(index, url_info)
+
+    def _remove_ordered(self, url_info: ChannelUrl, speed) -> bool:
+        index = bisect.bisect_left(self._ordered_speeds, speed)
+        while index < len(self._ordered_urls) and self._ordered_speeds[index] == speed:
+            if self._ordered_urls[index] is url_info:
+                break
+            index += 1
+        else:
+            # 速度键与记录不一致时退化为线性查找
+            index = next((i for i, url in enumerate(self._ordered_urls) if url is url_info), -1)
+            if index < 0:
+                return False
+        del self._ordered_speeds[index]
+        del self._ordered_urls[index]
+        return True
+
+    def sorted_urls(self) -> List[ChannelUrl]:
+        """按速度升序排列的地址列表"""
+        with self._lock:
+            return list(self._ordered_urls)
 
     def get_txt(self):
-        return '\n'.join(f"{self.name},{url.url}" for url in sorted(self.urls, key=lambda url: url.speed))
+        return '\n'.join(f"{self.name},{url.playback_url}" for url in self.sorted_urls())
 
     def get_m3u(self, title=''):
         if not title:
@@ -89,22 +233,22 @@ class ChannelInfo:
         tvg_logo = f"tvg-logo=\"{self.logo}\" " if self.logo else ''
         return '\n'.join(
             f"#EXTINF:-1 {tvg_id}tvg-name=\"{self.name}\" {tvg_logo}group-title=\"{title}\","
-            f"{self.name}\n{url.url}"
-            for url in sorted(self.urls, key=lambda url: url.speed)
+            f"{self.name}\n{url.playback_url}"
+            for url in self.sorted_urls()
         )
 
     def get_all(self, title='') -> str:
         if not title:
             title = self.title
-        sorted_urls = sorted(self.urls, key=lambda url: url.speed)
+        sorted_urls = self.sorted_urls()
         separator = ['', '===============================================================', '']
         tvg_id = f"tvg-id=\"{self.id}\" " if self.id != '' else ''
         tvg_logo = f"tvg-logo=\"{self.logo}\" " if self.logo else ''
-        return ('\n'.join(f"{self.name},{url.url}" for url in sorted_urls) + '\n'
+        return ('\n'.join(f"{self.name},{url.playback_url}" for url in sorted_urls) + '\n'
                 + '\n'.join(separator) + "\n"
                 + '\n'.join(
                     f"#EXTINF:-1 {tvg_id}tvg-name=\"{self.name}\" {tvg_logo}group-title=\"{title}\","
-                    f"{self.name}\n{url.url}" for url in sorted_urls)
+                    f"{self.name}\n{url.playback_url}" for url in sorted_urls)
                 )
 
 
@@ -113,25 +257,74 @@ class ChannelList:
     频道列表，包括多个频道信息
     """
 
-    def __init__(self):
+    __slots__ = ("_channels", "_sorted_keys", "_sorted_names", "_on_change", "_urls")
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None, urls: UrlRegistry = None):
         self._channels: Dict[str, ChannelInfo] = {}
-        self._lock = threading.RLock()
+        # 按频道名称排序键维护的有序索引，新增频道时二分插入
+        self._sorted_keys: List[tuple] = []
+        self._sorted_names: List[str] = []
+        self._on_change = on_change
+        self._urls = urls if urls is not None else UrlRegistry()
+
+    @property
+    def _lock(self) -> threading.RLock:
+        return _LIST_LOCKS.for_object(self)
+
+    def bind(self, on_change: Optional[Callable[[], None]], urls: UrlRegistry = None):
+        """重新绑定变更通知回调（列表及其中的频道变更时触发），指定 urls 时同时更换地址驻留表"""
+        with self._lock:
+            self._on_change = on_change
+            if urls is not None:
+                self._urls = urls
+            for channel_info in self._channels.values():
+                channel_info.bind(on_change)
 
     def count(self) -> int:
         with self._lock:
             return sum(len(info.urls) for info in self._channels.values())
 
     def add_channel(self, channel_name, channel_url: str, id='', logo=None):
+        channel_name = _intern(channel_name)
         with self._lock:
             if channel_name not in self._channels:
                 self._channels[channel_name] = ChannelInfo(id, channel_name)
+                self._channels[channel_name].bind(self._on_change)
+                self._insert_sorted(channel_name)
             channel_info = self._channels[channel_name]
             channel_info.set_logo(logo)
-            channel_info.add_url(ChannelUrl(channel_url))
+            channel_info.add_url(self._urls.intern(channel_url))
 
     def add_channel_info(self, channel_info: ChannelInfo):
         with self._lock:
+            if channel_info.name not in self._channels:
+                self._insert_sorted(channel_info.name)
             self._channels[channel_info.name] = channel_info
+            channel_info.bind(self._on_change)
+        if self._on_change is not None:
+            self._on_change()
+
+    def merge_channel_info(self, channel_info: ChannelInfo):
+        """
+        合并其他频道集中的频道：同名频道保留已有地址并加入新地址，地址实例通过本列表的驻留表登记，
+        已存在的地址以合并进来的检测结果为准
+        """
+        with self._lock:
+            target = self._channels.get(channel_info.name)
+            if target is None:
+                target = ChannelInfo(channel_info.id, channel_info.name)
+                target.title = channel_info.title
+                target.bind(self._on_change)
+                self._channels[channel_info.name] = target
+                self._insert_sorted(channel_info.name)
+            target.set_logo(channel_info.logo)
+            for url_info in channel_info.sorted_urls():
+                url = self._urls.adopt(url_info)
+                if url is not url_info:
+                    url.update_from(url_info)
+                target.add_url(url)
+        if self._on_change is not None:
+            self._on_change()
 
     def get_channel_names(self):
         with self._lock:
@@ -147,16 +340,19 @@ class ChannelList:
                 return self._channels.get(channel_name)
         return ChannelInfo()
 
+    def _insert_sorted(self, channel_name):
+        key = mixed_sort_key(channel_name)
+        index = bisect.bisect_right(self._sorted_keys, key)
+        self._sorted_keys.insert(index, key)
+        self._sorted_names.insert(index, channel_name)
+
     def _sorted_channels(self) -> List[ChannelInfo]:
         """
         获取按 ChannelInfo.name 排序后的频道列表
-        使用 mixed_sort_key 函数进行智能排序
+        有序索引在新增频道时按 mixed_sort_key 增量维护，读取时无需重新排序
         """
         with self._lock:
-            return sorted(
-                self._channels.values(),
-                key=lambda channel: mixed_sort_key(channel.name)
-            )
+            return [self._channels[name] for name in self._sorted_names]
 
     def get_m3u(self, title=''):
         with self._lock:
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional, Tuple
+
+import aiohttp
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.patterns import CONTENT_DISPOSITION_FILENAME_PATTERN
+from models.channel_info import ChannelInfo, ChannelUrl
+from services.checker import TsSample, parse_variants, scan_media_playlist
+from services.quality import quality_probe
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class AsyncChannelChecker:
+    """
+    基于 asyncio 的频道检测引擎
+    所有检测阶段运行在同一个事件循环中，共享一个按主机限流的连接池，
+    每个网络阶段都有独立的超时期限，整体检测仍受单频道超时约束
+    """
+
+    def __init__(self, checker, concurrency: int, limit_per_host: int = Constants.ASYNC_LIMIT_PER_HOST):
+        # 复用同步检测器中与网络无关的解析逻辑，保证两种引擎结果一致
+        self._checker = checker
+        self._concurrency = max(1, concurrency)
+        self._limit_per_host = max(1, limit_per_host)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def run(self, tasks: Iterable[Tuple[ChannelInfo, ChannelUrl, bool]],
+            on_result: Callable[[Tuple[ChannelInfo, ChannelUrl, bool], bool], None]) -> None:
+        """在独立事件循环中执行全部检测任务，每完成一个任务回调一次 on_result"""
+        asyncio.run(self._run(tasks, on_result))
+
+    async def _run(self, tasks, on_result):
+        connector = aiohttp.TCPConnector(limit=self._concurrency,
+                                         limit_per_host=self._limit_per_host,
+                                         ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self._session = session
+            task_iter = iter(tasks)
+
+            async def worker():
+                # 各协程共享同一个任务迭代器，避免一次性生成全部协程
+                for task in task_iter:
+                    if self._checker.cancelled:
+                        break
+                    channel_info, url_info, check_sub_m3u8 = task
+                    result = await self.check_single_with_timeout(channel_info, url_info, check_sub_m3u8)
+                    try:
+                        on_result(task, result)
+                    except Exception as e:
+                        logger.error(f"async result callback error: {e}")
+
+            await asyncio.gather(*(worker() for _ in range(self._concurrency)))
+        self._session = None
+
+    async def check_single_with_timeout(self, channel_info: ChannelInfo, url_info: ChannelUrl,
+                                        check_sub_m3u8, timeout=60) -> bool:
+        """带超时控制的频道检测方法"""
+        if self._checker.cancelled:
+            return False
+
+        cached = self._checker._cached_result(url_info, check_sub_m3u8)
+        if cached is not None:
+            return cached
+
+        logger.debug(f"Async checking {channel_info.name} with {url_info.url}")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._check_single(channel_info, url_info, check_sub_m3u8), timeout)
+            self._checker._record_stage("check", started)
+        except asyncio.TimeoutError:
+            # 超时不写入检测结果缓存，下次检测重新尝试
+            logger.warning(f"Check for {channel_info.name} with {url_info.url} timed out after {timeout} seconds")
+            return False
+        except Exception as e:
+            logger.error(f"async check_single error: {e}")
+            return False
+
+        self._checker._cache_result(url_info, check_sub_m3u8, result)
+        return result
+
+    async def _check_single(self, channel_info: ChannelInfo, url_info: ChannelUrl, check_sub_m3u8) -> bool:
+        if url_info.url.endswith(".mp4"):
+            return await self._check_mp4_validity(url_info.url)
+
+        if ".m3u8" not in url_info.url:
+            return False
+
+        if check_sub_m3u8:
+            # 第一阶段：基础验证
+            started = time.perf_counter()
+            m3u8_content = await self._check_m3u8_url(url_info)
+            self._checker._record_stage("m3u8", started)
+            if not m3u8_content:
+                return False
+
+            # 第二阶段：结构验证
+            playlist = scan_media_playlist(m3u8_content)
+            if not playlist.valid:
+                logger.debug(f"M3U8 structure invalid for {channel_info.name} with {url_info.url}: {playlist.reason}")
+                return False
+
+            # 第三阶段：TS验证，验证的同时完成测速
+            base_url = url_info.playback_url.rsplit('/', 1)[0]
+            ts_urls = self._checker._extract_ts_urls(m3u8_content, playlist)
+            started = time.perf_counter()
+            sample = await self._check_ts_availability(ts_urls, base_url)
+            self._checker._record_stage("ts", started)
+            if not sample.valid:
+                logger.debug(f"TS segments invalid for {channel_info.name} with {url_info.url}: {sample.reason}")
+                return False
+
+            # 第四阶段：测速
+            url_info.set_speed(sample.speed)
+
+            # 第五阶段：质量探测，解复用已下载的采样数据
+            if self._checker._probe_quality:
+                started = time.perf_counter()
+                url_info.set_quality(await quality_probe.probe_async(sample.data))
+                self._checker._record_stage("quality", started)
+
+            # 第六阶段：元数据提取
+            if not channel_info.name:
+                channel_info.set_name(await self._extract_channel_name(m3u8_content, url_info.playback_url))
+
+        return True
+
+    @staticmethod
+    def _timeout(timeout, connect=None) -> aiohttp.ClientTimeout:
+        """与 requests 的 (connect, read) 超时语义保持一致"""
+        if connect is None:
+            return aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=timeout - connect)
+
+    async def _check_mp4_validity(self, url: str, timeout=Constants.REQUEST_TIMEOUT) -> bool:
+        """MP4 播放有效性检查"""
+        try:
+            async with self._session.head(url, timeout=self._timeout(timeout)) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type')
+                if content_type and 'video/mp4' not in content_type.lower():
+                    return False
+
+                content_length = response.headers.get('Content-Length')
+                if content_length and int(content_length) < 1024:
+                    return False
+
+            async with self._session.get(url, timeout=self._timeout(timeout)) as response:
+                response.raise_for_status()
+                # 读取前 8Bit 内容，检查是否包含 MP4 头部信息
+                chunk = await response.content.read(8)
+            # MP4 文件以 0x00000018 或 0x00000020 开头，后跟 "ftyp" 字符串
+            return b'\x00\x00\x00\x18ftyp' in chunk or b'\x00\x00\x00\x20ftyp' in chunk
+        except Exception:
+            return False
+
+    async def _check_m3u8_url(self, url_info: ChannelUrl, timeout=Constants.REQUEST_TIMEOUT):
+        """带超时的m3u8 URL检查，主播放列表按码率/分辨率择优并发解析子播放列表"""
+        try:
+            content = await self._fetch_m3u8(url_info.url, timeout)
+        except Exception:
+            return None
+
+        if '#EXT-X-STREAM-INF' not in content:
+            return content
+
+        resolved = await self._resolve_variant(url_info.url, content, timeout)
+        if resolved is None:
+            return None
+        variant_url, content = resolved
+        url_info.set_resolved_url(variant_url)
+        return content
+
+    async def _fetch_m3u8(self, url: str, timeout=Constants.REQUEST_TIMEOUT) -> str:
+        async with self._session.get(url, timeout=self._timeout(timeout, 2)) as response:
+            response.raise_for_status()
+            return await response.text(errors='replace')
+
+    async def _fetch_variant(self, url: str, timeout=Constants.REQUEST_TIMEOUT) -> Optional[str]:
+        """获取子播放列表，子播放列表中不允许再嵌套主播放列表"""
+        try:
+            content = await self._fetch_m3u8(url, timeout)
+            return None if '#EXT-X-STREAM-INF' in content else content
+        except Exception:
+            return None
+
+    async def _resolve_variant(self, master_url: str, content: str,
+                               timeout=Constants.REQUEST_TIMEOUT) -> Optional[Tuple[str, str]]:
+        """
+        按码率/分辨率从高到低并发获取子播放列表，同时在途的数量受限
+        按优先级依次等待结果，排名最高的可用子播放列表胜出，返回 (子播放列表地址, 内容)
+        """
+        variants = deque(parse_variants(content, master_url))
+        in_flight = deque()
+
+        def fill():
+            while variants and len(in_flight) < Constants.VARIANT_CONCURRENCY:
+                variant_url = variants.popleft()
+                in_flight.append((variant_url, asyncio.ensure_future(self._fetch_variant(variant_url, timeout))))
+
+        try:
+            fill()
+            while in_flight:
+                variant_url, task = in_flight.popleft()
+                child_content = await task
+                if child_content:
+                    return variant_url, child_content
+                fill()
+            return None
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    async def _check_ts_availability(self, ts_urls, base_url) -> TsSample:
+        """从最新的片段开始逐个采样，得到可信的速度后提前结束"""
+        sample = TsSample(ts_urls, base_url)
+        for url in sample.candidates:
+            sample.tested_count += 1
+            if await self._sample_ts(url, sample):
+                break
+        return sample
+
+    async def _sample_ts(self, url, sample: TsSample, timeout=Constants.REQUEST_TIMEOUT) -> bool:
+        """一次范围请求完成片段验证和测速，读取量足够时返回 True"""
+        try:
+            async with self._session.get(url, headers=TsSample.RANGE_HEADERS,
+                                         timeout=self._timeout(timeout + 1, 1)) as response:
+                response.raise_for_status()
+                # 读取片段开头的数据并计时
+                start = time.time()
+                chunks = []
+                size = 0
+                while size < Constants.TS_SAMPLE_BYTES:
+                    chunk = await response.content.read(16384)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+                elapsed = time.time() - start
+            return sample.record(size, elapsed, b"".join(chunks))
+        except Exception as e:
+            logger.debug(f"_sample_ts error: {e}")
+            return False
+
+    async def _extract_channel_name(self, m3u8_content, url, timeout=3):
+        """带超时的频道名称提取"""
+        # 方案1: 从EXTINF行提取
+        channel_name = self._checker._extract_from_extinf(m3u8_content)
+        if channel_name:
+            return channel_name
+
+        # 方案2: 从Content-Disposition头提取
+        try:
+            return await asyncio.wait_for(self._extract_from_content_disposition(url), timeout)
+        except Exception as e:
+            logger.error(f"Channel name extraction error: {e}")
+            return None
+
+    async def _extract_from_content_disposition(self, url, timeout=2):
+        """带超时的Content-Disposition提取"""
+        try:
+            async with self._session.head(url, timeout=self._timeout(timeout, 1), allow_redirects=True) as response:
+                cd_header = response.headers.get('content-disposition')
+            if cd_header:
+                filename_match = CONTENT_DISPOSITION_FILENAME_PATTERN.findall(cd_header)
+                if filename_match:
+                    filename = filename_match[0].strip('";')
+                    return os.path.splitext(filename)[0]
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            pass
+        except Exception as e:
+            logger.error(f"extract_from_content_disposition error: {e}")
+
+        return None
@@ -1,9 +1,12 @@
+import itertools
 import os
+import sys
 import threading
-from typing import Dict
+from typing import Dict, Iterator, Optional, Tuple
+from uuid import uuid4
 
 from core.singleton import singleton
-from models.channel_info import ChannelList, ChannelInfo
+from models.channel_info import ChannelList, ChannelInfo, UrlRegistry
 from services import category_manager
 
 
@@ -38,18 +41,110 @@ class ChannelBaseModel:
     def __init__(self):
         self._epg = None
         self._channelGroups: Dict[str, ChannelList] = {}
+        # 本频道集的地址驻留表，工作频道集各自独立，提交时由当前频道集接管
+        self._urls = UrlRegistry()
         self._lock = threading.RLock()
+        # 数据版本号：任何影响输出内容的变更都会递增，用于渲染缓存失效和 ETag
+        self._version_counter = itertools.count(1)
+        self._version = 0
+        self._instance_token = uuid4().hex[:8]
+        # 最近一次更新验证通过的地址及其速度和子播放列表地址，作为增量更新的比较基准；清空频道数据时保留
+        self._published: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._publish_round = 0
 
     @property
     def epg(self):
         return self._epg
 
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def instance_token(self) -> str:
+        return self._instance_token
+
+    def mark_changed(self):
+        """标记数据已变更"""
+        self._version = next(self._version_counter)
+
+    @property
+    def publish_round(self) -> int:
+        """已发布的更新轮次，用于增量更新时轮换抽检已有地址"""
+        return self._publish_round
+
+    def publish(self):
+        """记录当前验证通过的地址及检测结果，忽略处理的分类不计入"""
+        with self._lock:
+            published = {}
+            for group_name, channel_list in self._channelGroups.items():
+                if category_manager.is_ignore(group_name):
+                    continue
+                for channel_name in list(channel_list.get_channel_names()):
+                    for url_info in channel_list.get_channel(channel_name).get_urls():
+                        published[url_info.url] = (url_info.speed, url_info.resolved_url)
+            self._published = published
+            self._publish_round += 1
+
+    def published_result(self, url: str) -> Optional[Tuple[float, Optional[str]]]:
+        """上次发布时该地址的 (速度, 子播放列表地址)，未发布过的地址返回 None"""
+        return self._published.get(url)
+
+    def create_working_set(self) -> 'ChannelBaseModel':
+        """
+        创建独立的工作频道集，检测任务在其中解析和检测，完成后通过 commit 整体替换
+        工作频道集继承当前的发布结果和更新轮次，增量更新以当前发布的数据为比较基准
+        """
+        working_set = ChannelBaseModel()
+        with self._lock:
+            working_set._epg = self._epg
+            working_set._published = self._published
+            working_set._publish_round = self._publish_round
+        return working_set
+
+    def commit(self, working_set: 'ChannelBaseModel', replace: bool = True):
+        """
+        将工作频道集的检测结果原子地应用到当前频道集
+        replace 为 True 时整体替换；否则按分组合并，同名频道合并地址，同一地址以工作频道集的检测结果为准
+        """
+        with working_set._lock:
+            groups = dict(working_set._channelGroups)
+            urls = working_set._urls
+            epg = working_set._epg
+            published = working_set._published
+            publish_round = working_set._publish_round
+
+        with self._lock:
+            if replace:
+                self._urls = urls
+                for channel_list in groups.values():
+                    channel_list.bind(self.mark_changed, urls)
+                self._channelGroups = groups
+            else:
+                for group_name, channel_list in groups.items():
+                    target = self._channelGroups.get(group_name)
+                    if target is None:
+                        target = self._channelGroups[group_name] = ChannelList(self.mark_changed, self._urls)
+                    for channel_name in list(channel_list.get_channel_names()):
+                        target.merge_channel_info(channel_list.get_channel(channel_name))
+                # 合并新增的分组后恢复分组顺序
+                self.sort()
+                # 合并时未参与本次检测的已有地址仍在发布数据中，增量更新的比较基准取并集
+                if published is not self._published:
+                    published = {**self._published, **published}
+            self._epg = epg
+            self._published = published
+            self._publish_round = publish_round
+            self.mark_changed()
+
     def set_epg(self, file: str, source: str, domain: str = None):
         self._epg = EpgBaseModel(file, source, domain)
+        self.mark_changed()
 
     def clear(self):
         self._epg = None
         self._channelGroups.clear()
+        self.mark_changed()
 
     def sort(self):
         fix_names = category_manager.get_groups()
@@ -63,6 +158,7 @@ class ChannelBaseModel:
                     key=lambda item: index_map.get(item[0], default_index)
                 )
             )
+        self.mark_changed()
 
     def total_count(self):
         with self._lock:
@@ -78,9 +174,9 @@ class ChannelBaseModel:
             # 自动分类处理
             category_info = category_manager.get_category_object(channel_name, name)
             if category_info:
-                category_name = category_info.get('name', name)
+                category_name = sys.intern(category_info.get('name', name))
                 if category_name not in self._channelGroups:
-                    self._channelGroups[category_name] = ChannelList()
+                    self._channelGroups[category_name] = ChannelList(self.mark_changed, self._urls)
                 channel_list = self._channelGroups[category_name]
                 if not category_manager.is_exclude(category_info, channel_name):
                     channel_list.add_channel(channel_name, channel_url, id, logo)
@@ -88,9 +184,10 @@ class ChannelBaseModel:
     def add_channel_info(self, name, channel_info: ChannelInfo):
         if not name:
             name = channel_info.title
+        name = sys.intern(name)
         with self._lock:
             if name not in self._channelGroups:
-                self._channelGroups[name] = ChannelList()
+                self._channelGroups[name] = ChannelList(self.mark_changed, self._urls)
             channel_list = self._channelGroups[name]
             channel_list.add_channel_info(channel_info)
 
@@ -126,19 +223,36 @@ class ChannelBaseModel:
 
     def to_m3u_string(self) -> str:
         with self._lock:
-            result = [self._get_extm3u_header()]
-            for group_name, channel_list in self._channelGroups.items():
-                result.append(channel_list.get_m3u(group_name))
-            return "\n".join(result).strip()
+            return "".join(self.iter_m3u())
 
     def to_txt_string(self) -> str:
         with self._lock:
-            result = []
-            for group_name, channel_list in self._channelGroups.items():
-                result.append(f"{group_name},#genre#")
-                result.append(channel_list.get_txt())
-                result.append("")
-            return "\n".join(result).strip()
+            return "".join(self.iter_txt())
+
+    def _group_items(self):
+        with self._lock:
+            return list(self._channelGroups.items())
+
+    def iter_m3u(self) -> Iterator[str]:
+        """按分组逐块生成M3U内容，不在生成期间持有全局锁"""
+
+        def chunks():
+            yield self._get_extm3u_header()
+            for group_name, channel_list in self._group_items():
+                yield "\n" + channel_list.get_m3u(group_name)
+
+        return _strip_chunks(chunks())
+
+    def iter_txt(self) -> Iterator[str]:
+        """按分组逐块生成TXT内容，不在生成期间持有全局锁"""
+
+        def chunks():
+            separator = ""
+            for group_name, channel_list in self._group_items():
+                yield f"{separator}{group_name},#genre#\n{channel_list.get_txt()}\n"
+                separator = "\n"
+
+        return _strip_chunks(chunks())
 
     def write_to_txt_file(self, file_handle):
         with self._lock:
@@ -155,6 +269,24 @@ class ChannelBaseModel:
                 file_handle.write("\n")
 
 
+def _strip_chunks(chunks: Iterator[str]) -> Iterator[str]:
+    """逐块输出内容，效果等同于对拼接后的完整字符串调用 strip()"""
+    started = False
+    pending = ''
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            yield pending + body
+            pending = chunk[len(body):]
+        else:
+            pending += chunk
+
+
 @singleton
 class ChannelManager(ChannelBaseModel):
     """
@@ -1,96 +1,342 @@
-import concurrent
+import itertools
 import os
-import re
+import socket
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from datetime import datetime
-from typing import Tuple
+from typing import Iterator, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import m3u8
 import requests
 from requests import Timeout
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 
 from core.constants import Constants
+from core.deadline import Deadline, TimeoutException
 from core.execution_time import log_execution_time, ref
+from core.http_pool import http_pool
 from core.logger_factory import LoggerFactory
+from core.patterns import (BANDWIDTH_PATTERN, CONTENT_DISPOSITION_FILENAME_PATTERN, EXTINF_NAME_PATTERN,
+                           EXTINF_NAME_STRIP_TABLE, RESOLUTION_PATTERN, STREAM_INF_PATTERN)
 from models.channel_info import ChannelInfo, ChannelUrl
 from models.counter import Counter
 from services import channel_manager, category_manager
+from services.channel import ChannelBaseModel
+from services.probe_cache import probe_cache
+from services.progress import ProgressReporter
+from services.quality import quality_probe
+from services.scheduler import HostScheduler
+from utils.url_util import extract_host
 
 logger = LoggerFactory.get_logger(__name__)
 
 
-class TimeoutException(Exception):
-    """自定义超时异常"""
-    pass
+def parse_variants(content: str, master_url: str) -> List[str]:
+    """解析主播放列表中的子播放列表地址，按码率、分辨率从高到低排序，相同时保持原有顺序"""
+    variants = []
+    attributes = None
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = STREAM_INF_PATTERN.match(line)
+        if match:
+            attributes = match.group(1)
+            continue
+        if attributes is None or line.startswith('#'):
+            continue
+
+        bandwidth = BANDWIDTH_PATTERN.search(attributes)
+        resolution = RESOLUTION_PATTERN.search(attributes)
+        rank = (int(bandwidth.group(1)) if bandwidth else 0,
+                int(resolution.group(1)) * int(resolution.group(2)) if resolution else 0)
+        variants.append((rank, line if line.startswith('http') else urljoin(master_url, line)))
+        attributes = None
+
+    variants.sort(key=lambda item: item[0], reverse=True)
+    return [url for _, url in variants]
+
+
+class MediaPlaylist:
+    """
+    媒体播放列表的单次扫描结果
+    segments 只保留最后若干个片段地址；遇到无法识别的片段结构时为 None，由调用方回退到完整解析
+    """
+
+    __slots__ = ("valid", "reason", "segments", "segment_count", "target_duration", "endlist")
+
+    REQUIRED_TAGS = ("#EXT-X-VERSION", "#EXT-X-MEDIA-SEQUENCE")
+
+    def __init__(self):
+        self.valid = False
+        self.reason = ""
+        self.segments: Optional[List[str]] = None
+        self.segment_count = 0
+        self.target_duration: Optional[float] = None
+        self.endlist = False
+
+
+def scan_media_playlist(content: str, keep: int = Constants.TS_SEGMENT_TEST_COUNT) -> MediaPlaylist:
+    """单次遍历媒体播放列表：校验头部和必需标签，收集最后 keep 个片段地址，读取目标时长和结束标记"""
+    playlist = MediaPlaylist()
+    if not content.startswith("#EXTM3U"):
+        playlist.reason = "missing #EXTM3U header"
+        return playlist
+
+    found_tags = set()
+    segments = deque(maxlen=keep)
+    pending_segment = False
+    unusual = False
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('#'):
+            if pending_segment:
+                segments.append(line)
+                playlist.segment_count += 1
+                pending_segment = False
+            else:
+                unusual = True
+            continue
+
+        if line.startswith('#EXTINF'):
+            pending_segment = True
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            try:
+                playlist.target_duration = float(line[22:])
+            except ValueError:
+                pass
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist.endlist = True
+        else:
+            for tag in MediaPlaylist.REQUIRED_TAGS:
+                if line.startswith(tag):
+                    found_tags.add(tag)
+
+    missing_tags = [tag for tag in MediaPlaylist.REQUIRED_TAGS if tag not in found_tags]
+    if missing_tags:
+        playlist.reason = f"missing required tags: {', '.join(missing_tags)}"
+        return playlist
+
+    playlist.valid = True
+    playlist.reason = "结构完整"
+    if segments and not unusual:
+        playlist.segments = list(segments)
+    return playlist
+
+
+class TsSample:
+    """
+    TS片段渐进采样结果
+    从最新的片段（直播边缘）开始采样，每个片段只发起一次范围请求，同时完成可用性验证和测速；
+    某个片段读取到足够的数据即停止采样
+    """
+
+    __slots__ = ("candidates", "tested_count", "valid_count", "total_size", "total_time", "data")
+
+    RANGE_HEADERS = {"Range": f"bytes=0-{Constants.TS_SAMPLE_BYTES - 1}"}
+
+    def __init__(self, ts_urls, base_url):
+        base_url = base_url if base_url.endswith('/') else base_url + '/'
+        newest = list(ts_urls)[::-1][:Constants.TS_SEGMENT_TEST_COUNT]
+        self.candidates = [ts if ts.startswith('http') else urljoin(base_url, ts) for ts in newest]
+        self.tested_count = 0
+        self.valid_count = 0
+        self.total_size = 0
+        self.total_time = 0.0
+        # 首个有效片段的采样数据
+        self.data = b""
+
+    def record(self, size: int, elapsed: float, data: bytes) -> bool:
+        """记录一个有效片段的读取结果，读取量足以得出可信的速度时返回 True"""
+        self.valid_count += 1
+        self.total_size += size
+        self.total_time += elapsed
+        if not self.data:
+            self.data = data
+        return size >= Constants.TS_CONFIDENT_BYTES
+
+    @property
+    def valid(self) -> bool:
+        return self.valid_count > 0
+
+    @property
+    def speed(self) -> float:
+        """采样速度，单位：KB/s"""
+        return 0 if self.total_time == 0 else (self.total_size / self.total_time) / 1024
+
+    @property
+    def reason(self) -> str:
+        if not self.valid:
+            return "all ts segments are not available"
+        return f"{self.valid_count}/{self.tested_count} segments are available."
 
 
 class ChannelChecker:
-    def __init__(self, url="", start=0, size=1):
+    def __init__(self, url="", start=0, size=1, use_cache=True, probe_quality=False,
+                 model: ChannelBaseModel = None, cancel_event: threading.Event = None):
         self._url = url
         self._start = start
         self._size = size
+        self._use_cache = use_cache
+        self._probe_quality = probe_quality
+        # 检测结果写入的频道集，默认为当前频道集
+        self._model = model or channel_manager
+        self._cancel_event = cancel_event
+        self._scheduler = None
+        self._progress: Optional[ProgressReporter] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """任务是否已取消，取消后不再发起新的检测"""
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    _variant_executor: Optional[ThreadPoolExecutor] = None
+    _variant_executor_lock = threading.Lock()
+
+    @classmethod
+    def _get_variant_executor(cls) -> ThreadPoolExecutor:
+        """子播放列表获取共用的线程池，避免每次检测都创建线程"""
+        with cls._variant_executor_lock:
+            if cls._variant_executor is None:
+                cls._variant_executor = ThreadPoolExecutor(max_workers=Constants.VARIANT_FETCH_WORKERS,
+                                                           thread_name_prefix="m3u8-variant")
+            return cls._variant_executor
+
+    @classmethod
+    def _reset_after_fork(cls):
+        """子进程中不存在父进程的线程，丢弃继承来的线程池"""
+        cls._variant_executor = None
+        cls._variant_executor_lock = threading.Lock()
 
     @log_execution_time(name=ref("channel_info.name"), url=ref("url_info.url"))
     def check_single_with_timeout(self, channel_info: ChannelInfo, url_info: ChannelUrl,
                                   check_sub_m3u8, timeout=60) -> bool:
-        """带超时控制的频道检测方法"""
+        """
+        带超时控制的频道检测方法
+        超时时间作为截止期限传递给各网络阶段，到期后检测立即结束并释放当前线程
+        """
+        if self.cancelled:
+            return False
+
+        cached = self._cached_result(url_info, check_sub_m3u8)
+        if cached is not None:
+            return cached
+
+        result, timed_out = self._run_check(channel_info, url_info, check_sub_m3u8, timeout)
+        if not timed_out:
+            # 超时多为暂时性的网络问题，不写入缓存，下次检测重新尝试
+            self._cache_result(url_info, check_sub_m3u8, result)
+        return result
+
+    def _run_check(self, channel_info: ChannelInfo, url_info: ChannelUrl, check_sub_m3u8,
+                   timeout=60) -> Tuple[bool, bool]:
+        """执行一次网络检测，返回 (检测结果, 是否超时)"""
         logger.debug(f"Checking {channel_info.name} with {url_info.url}")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(self._check_single, channel_info, url_info, check_sub_m3u8)
-            try:
-                return future.result(timeout=timeout)
-            except concurrent.futures.TimeoutError:
-                # 超时发生时，future会被自动取消
-                logger.warning(
-                    f"Check for {channel_info.name} with {url_info.url} timed out after {timeout} seconds")
-                return False
-            except Exception as e:
-                logger.error(f"check_single error: {e}")
-                return False
+        started = time.perf_counter()
+        try:
+            result = self._check_single(channel_info, url_info, check_sub_m3u8, Deadline(timeout))
+            self._record_stage("check", started)
+            return result, False
+        except TimeoutException as e:
+            self._report_network_error(url_info.url, e)
+            logger.warning(f"Check for {channel_info.name} with {url_info.url} timed out: {e}")
+            return False, True
+        except Exception as e:
+            logger.error(f"check_single error: {e}")
+            return False, False
 
-    def _check_single(self, channel_info: ChannelInfo, url_info: ChannelUrl, check_sub_m3u8) -> bool:
+    @staticmethod
+    def _is_network_probe(url: str, check_sub_m3u8) -> bool:
+        """只有真正发起网络请求的检测结果才值得缓存"""
+        return url.endswith(".mp4") or (bool(check_sub_m3u8) and ".m3u8" in url)
+
+    def _cached_result(self, url_info: ChannelUrl, check_sub_m3u8) -> Optional[bool]:
+        """查询检测结果缓存，命中时回填速度和子播放列表地址"""
+        if not self._use_cache or not self._is_network_probe(url_info.url, check_sub_m3u8):
+            return None
+
+        cached = probe_cache.get(url_info.url)
+        if cached is None:
+            return None
+
+        if cached.valid:
+            url_info.set_speed(cached.speed)
+            if cached.resolved_url:
+                url_info.set_resolved_url(cached.resolved_url)
+        logger.debug(f"Probe cache hit for {url_info.url}: {cached.valid}")
+        return cached.valid
+
+    def _cache_result(self, url_info: ChannelUrl, check_sub_m3u8, result: bool):
+        """记录检测结果"""
+        if not self._use_cache or not self._is_network_probe(url_info.url, check_sub_m3u8):
+            return
+
+        probe_cache.put(url_info.url, result, url_info.speed if result else 0, url_info.resolved_url)
+
+    def _record_stage(self, stage: str, started: float):
+        """批量检测时记录检测阶段耗时"""
+        if self._progress is not None:
+            self._progress.record_stage(stage, time.perf_counter() - started)
+
+    def _check_single(self, channel_info: ChannelInfo, url_info: ChannelUrl, check_sub_m3u8,
+                      deadline: Deadline) -> bool:
         if url_info.url.endswith(".mp4"):
-            return self._check_mp4_validity(url_info.url)
+            return self._check_mp4_validity(url_info.url, deadline)
 
         if ".m3u8" not in url_info.url:
             return False
 
         if check_sub_m3u8:
             # 第一阶段：基础验证
-            m3u8_content = self._check_m3u8_url(url_info)
+            started = time.perf_counter()
+            m3u8_content = self._check_m3u8_url(url_info, deadline)
+            self._record_stage("m3u8", started)
             if not m3u8_content:
                 return False
 
             # 第二阶段：结构验证
-            is_valid, reason = self._check_m3u8_validity(m3u8_content)
-            if not is_valid:
-                logger.debug(f"M3U8 structure invalid for {channel_info.name} with {url_info.url}: {reason}")
+            playlist = scan_media_playlist(m3u8_content)
+            if not playlist.valid:
+                logger.debug(f"M3U8 structure invalid for {channel_info.name} with {url_info.url}: {playlist.reason}")
                 return False
 
-            # 第三阶段：TS验证
-            base_url = url_info.url.rsplit('/', 1)[0]
-            ts_urls = self._extract_ts_urls(m3u8_content)
-            ts_valid, ts_reason, tested_urls = self._check_ts_availability(ts_urls, base_url)
-            if not ts_valid:
-                logger.debug(f"TS segments invalid for {channel_info.name} with {url_info.url}: {ts_reason}")
+            # 第三阶段：TS验证，验证的同时完成测速
+            base_url = url_info.playback_url.rsplit('/', 1)[0]
+            ts_urls = self._extract_ts_urls(m3u8_content, playlist)
+            started = time.perf_counter()
+            sample = self._check_ts_availability(ts_urls, base_url, deadline)
+            self._record_stage("ts", started)
+            if not sample.valid:
+                logger.debug(f"TS segments invalid for {channel_info.name} with {url_info.url}: {sample.reason}")
                 return False
 
             # 第四阶段：测速
-            url_info.set_speed(self._benchmark_speed(tested_urls))
+            url_info.set_speed(sample.speed)
+
+            # 第五阶段：质量探测，解复用已下载的采样数据；期限已到时跳过探测，不影响已通过的检测结果
+            if self._probe_quality and not deadline.expired():
+                started = time.perf_counter()
+                url_info.set_quality(quality_probe.probe(sample.data,
+                                                         min(Constants.QUALITY_PROBE_TIMEOUT, deadline.remaining())))
+                self._record_stage("quality", started)
 
-            # 第五阶段：元数据提取
+            # 第六阶段：元数据提取
             if not channel_info.name:
-                channel_info.set_name(self._extract_channel_name(m3u8_content, url_info.url))
+                channel_info.set_name(self._extract_channel_name(m3u8_content, url_info.playback_url, deadline))
 
         return True
 
-    def _check_mp4_validity(self, url: str, timeout=Constants.REQUEST_TIMEOUT) -> bool:
+    def _check_mp4_validity(self, url: str, deadline: Deadline, timeout=Constants.REQUEST_TIMEOUT) -> bool:
         """MP4 播放有效性检查"""
         try:
-            response = requests.head(url, timeout=Constants.REQUEST_TIMEOUT)
+            session = http_pool.session()
+            response = session.head(url, timeout=deadline.timeout(timeout, timeout))
             response.raise_for_status()
             content_type = response.headers.get('Content-Type')
             if content_type and 'video/mp4' not in content_type.lower():
@@ -100,147 +346,180 @@ class ChannelChecker:
             if content_length and int(content_length) < 1024:
                 return False
 
-            partial_response = requests.get(url, stream=True, timeout=timeout)
-            partial_response.raise_for_status()
-            # 读取前 8Bit 内容，检查是否包含 MP4 头部信息
-            chunk = partial_response.raw.read(8)
-            partial_response.close()
+            with session.get(url, stream=True, timeout=deadline.timeout(timeout, timeout)) as partial_response:
+                partial_response.raise_for_status()
+                # 读取前 8Bit 内容，检查是否包含 MP4 头部信息
+                chunk = b""
+                for data in self._iter_body(partial_response, deadline, 8):
+                    chunk += data
+                    if len(chunk) >= 8:
+                        break
             # MP4 文件以 0x00000018 或 0x00000020 开头，后跟 "ftyp" 字符串
             if b'\x00\x00\x00\x18ftyp' in chunk or b'\x00\x00\x00\x20ftyp' in chunk:
                 return True
             return False
-        except:
+        except TimeoutException:
+            raise
+        except Timeout as e:
+            # 单次请求超时同样按超时处理，结果不写入缓存
+            raise TimeoutException(f"request to {url} timed out: {e}") from e
+        except Exception as e:
+            self._report_network_error(url, e)
             return False
 
-    def _check_m3u8_url(self, url_info: ChannelUrl, timeout=Constants.REQUEST_TIMEOUT):
-        """带超时的m3u8 URL检查，支持递归解析子m3u8"""
+    def _check_m3u8_url(self, url_info: ChannelUrl, deadline: Deadline, timeout=Constants.REQUEST_TIMEOUT):
+        """带超时的m3u8 URL检查，主播放列表按码率/分辨率择优并发解析子播放列表"""
         try:
-            response = requests.get(url_info.url, timeout=(2, timeout - 2))
-            response.raise_for_status()
-            content = response.text
-
-            if '#EXT-X-STREAM-INF' in content:
-                # 使用正则表达式提取所有流信息和路径
-                for match in re.finditer(r'#EXT-X-STREAM-INF:.*?\n(.+)', content):
-                    child_m3u8 = match.group(1).strip()
-                    url_info.set_url(child_m3u8
-                                     if child_m3u8.startswith('http')
-                                     else urljoin(url_info.url, child_m3u8))
-                    child_content = self._check_m3u8_url(url_info)
-                    if child_content:
-                        content = child_content
-                        break
+            content = self._fetch_m3u8(url_info.url, deadline, timeout)
+        except TimeoutException:
+            raise
+        except Timeout as e:
+            # 单次请求超时同样按超时处理，结果不写入缓存
+            raise TimeoutException(f"request to {url_info.url} timed out: {e}") from e
+        except Exception as e:
+            self._report_network_error(url_info.url, e)
+            return None
 
+        if '#EXT-X-STREAM-INF' not in content:
             return content
-        except:
+
+        resolved = self._resolve_variant(url_info.url, content, deadline, timeout)
+        if resolved is None:
             return None
+        variant_url, content = resolved
+        url_info.set_resolved_url(variant_url)
+        return content
 
-    def _check_m3u8_validity(self, m3u8_content):
-        """增强版M3U8有效性验证"""
-        # 基础验证
-        if not m3u8_content.startswith("#EXTM3U"):
-            return False, "missing #EXTM3U header"
-
-        # 结构验证
-        required_tags = ["#EXT-X-VERSION", "#EXT-X-MEDIA-SEQUENCE"]
-        missing_tags = [tag for tag in required_tags if tag not in m3u8_content]
-        if missing_tags:
-            return False, f"missing required tags: {', '.join(missing_tags)}"
-
-        return True, "结构完整"
-
-    def _check_ts_availability(self, ts_urls, base_url):
-        """带超时和并发的TS片段检查"""
-        success = Counter()
-        max_test_count = min(len(ts_urls), Constants.TS_SEGMENT_TEST_COUNT)
-
-        # 使用线程池并发测试TS片段
-        with ThreadPoolExecutor(max_workers=max_test_count) as executor:
-            futures = []
-            tested_urls = []
-
-            for ts in ts_urls[:max_test_count]:
-                full_url = ts if ts.startswith('http') else urljoin(
-                    base_url if base_url.endswith('/') else base_url + '/', ts)
-                futures.append(executor.submit(self._validate_ts, full_url, timeout=Constants.REQUEST_TIMEOUT))
-
-            # 带超时的结果处理
-            for future in as_completed(futures):
-                try:
-                    ts_url, is_valid = future.result(timeout=30)
-                    if is_valid:
-                        success.increment()
-                        tested_urls.append(ts_url)
-                except Exception as e:
-                    logger.debug(f"TS check error: {e}")
-
-        if success.get_value() == 0:
-            return False, "all ts segments are not available", []
-        return True, f"{success.get_value()}/{max_test_count} segments are available.", tested_urls
-
-    def _validate_ts(self, url, timeout) -> Tuple[str, bool]:
-        """带超时的TS片段验证"""
-        try:
-            # 只获取头部信息，减少数据传输
-            response = requests.head(url, timeout=(1, timeout - 1), allow_redirects=True)
+    def _fetch_m3u8(self, url: str, deadline: Deadline, timeout=Constants.REQUEST_TIMEOUT) -> str:
+        with http_pool.session().get(url, stream=True, timeout=deadline.timeout(2, timeout - 2)) as response:
             response.raise_for_status()
-            return url, response.status_code == 200
+            return self._read_text(response, deadline)
+
+    def _fetch_variant(self, url: str, deadline: Deadline, timeout=Constants.REQUEST_TIMEOUT) -> Optional[str]:
+        """获取子播放列表，子播放列表中不允许再嵌套主播放列表"""
+        try:
+            content = self._fetch_m3u8(url, deadline, timeout)
+            return None if '#EXT-X-STREAM-INF' in content else content
+        except TimeoutException:
+            return None
         except Exception as e:
-            logger.debug(f"_validate_ts error: {e}")
-            return url, False
+            self._report_network_error(url, e)
+            return None
 
-    def _extract_ts_urls(self, m3u8_content):
-        m3u8_obj = m3u8.loads(m3u8_content)
-        return m3u8_obj.segments.uri
+    def _resolve_variant(self, master_url: str, content: str, deadline: Deadline,
+                         timeout=Constants.REQUEST_TIMEOUT) -> Optional[Tuple[str, str]]:
+        """
+        按码率/分辨率从高到低并发获取子播放列表，同时在途的数量受限
+        按优先级依次等待结果，排名最高的可用子播放列表胜出，返回 (子播放列表地址, 内容)
+        """
+        variants = deque(parse_variants(content, master_url))
+        executor = self._get_variant_executor()
+        in_flight = deque()
+
+        def fill():
+            while variants and len(in_flight) < Constants.VARIANT_CONCURRENCY:
+                variant_url = variants.popleft()
+                in_flight.append((variant_url, executor.submit(self._fetch_variant, variant_url, deadline, timeout)))
 
-    def _benchmark_speed(self, ts_urls, timeout=Constants.REQUEST_TIMEOUT):
-        """带超时的TS片段测速"""
-        total_size = 0
-        total_time = 0
+        try:
+            fill()
+            while in_flight:
+                variant_url, future = in_flight.popleft()
+                try:
+                    child_content = future.result(timeout=deadline.remaining())
+                except FutureTimeoutError:
+                    deadline.check()
+                    continue
+                if child_content:
+                    return variant_url, child_content
+                fill()
+            return None
+        finally:
+            for _, future in in_flight:
+                future.cancel()
 
-        session = requests.Session()
-        for url in ts_urls:
+    @staticmethod
+    def _iter_body(response: requests.Response, deadline: Deadline, chunk_size: int) -> Iterator[bytes]:
+        """
+        在截止期限内流式读取响应内容
+        每次读取前将套接字超时设为剩余时间，且每次最多接收一次网络数据，
+        服务端缓慢滴流数据时也会在期限到达时抛出 TimeoutException
+        """
+        raw = response.raw
+        # urllib3 1.26 没有 read1，退化为 read：单次读取可能多次接收数据，超出期限的时间不超过一次套接字超时
+        read = getattr(raw, "read1", None) or raw.read
+        while True:
+            deadline.check()
+            connection = raw.connection
+            sock = getattr(connection, "sock", None) if connection is not None else None
+            if sock is not None:
+                sock.settimeout(max(deadline.remaining(), 0.001))
             try:
-                with session.get(url, stream=True, timeout=timeout) as res:
-                    res.raise_for_status()
-                    # 精确读取前512KB数据并计时
-                    start = time.time()
-                    data_chunks = res.iter_content(1024)
-                    size = sum(len(chunk) for chunk, _ in zip(data_chunks, range(512)))
-                    elapsed = time.time() - start
-
-                    total_size += size
-                    total_time += elapsed
-            except:
-                continue
+                chunk = read(chunk_size, decode_content=True)
+            except (ReadTimeoutError, ProtocolError, socket.timeout):
+                deadline.check()
+                raise
+            if not chunk:
+                return
+            yield chunk
+
+    @classmethod
+    def _read_text(cls, response: requests.Response, deadline: Deadline) -> str:
+        """在截止期限内读取响应内容"""
+        chunks = list(cls._iter_body(response, deadline, 8192))
+        return b"".join(chunks).decode(response.encoding or 'utf-8', errors='replace')
+
+    def _check_ts_availability(self, ts_urls, base_url, deadline: Deadline) -> TsSample:
+        """从最新的片段开始逐个采样，得到可信的速度后提前结束"""
+        sample = TsSample(ts_urls, base_url)
+        for url in sample.candidates:
+            sample.tested_count += 1
+            if self._sample_ts(url, sample, deadline):
+                break
+        return sample
+
+    def _sample_ts(self, url, sample: TsSample, deadline: Deadline, timeout=Constants.REQUEST_TIMEOUT) -> bool:
+        """一次范围请求完成片段验证和测速，读取量足够时返回 True"""
+        try:
+            with http_pool.session().get(url, stream=True, headers=TsSample.RANGE_HEADERS,
+                                         timeout=deadline.timeout(1, timeout)) as response:
+                response.raise_for_status()
+                # 读取片段开头的数据并计时
+                start = time.time()
+                chunks = []
+                size = 0
+                for chunk in self._iter_body(response, deadline, 16384):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= Constants.TS_SAMPLE_BYTES:
+                        break
+                elapsed = time.time() - start
+            return sample.record(size, elapsed, b"".join(chunks))
+        except TimeoutException:
+            raise
+        except Exception as e:
+            logger.debug(f"_sample_ts error: {e}")
+            self._report_network_error(url, e)
+            return False
 
-        session.close()
-        return 0 if total_time == 0 else (total_size / total_time) / 1024
+    @staticmethod
+    def _extract_ts_urls(m3u8_content, playlist: MediaPlaylist = None):
+        """优先使用单次扫描得到的片段地址，片段结构无法识别时回退到完整解析"""
+        if playlist is None:
+            playlist = scan_media_playlist(m3u8_content)
+        if playlist.segments is not None:
+            return playlist.segments
+        return m3u8.loads(m3u8_content).segments.uri
 
-    def _extract_channel_name(self, m3u8_content, url, timeout=3):
+    def _extract_channel_name(self, m3u8_content, url, deadline: Deadline, timeout=3):
         """带超时的频道名称提取"""
+        # 方案1: 从EXTINF行提取
+        channel_name = self._extract_from_extinf(m3u8_content)
+        if channel_name:
+            return channel_name
 
-        def get_channel_name_worker(m3u8_info, request_url):
-            """频道名称提取的实际工作函数"""
-            # 方案1: 从EXTINF行提取
-            channel_name = self._extract_from_extinf(m3u8_info)
-            if channel_name:
-                return channel_name
-
-            # 方案2: 从Content-Disposition头提取 - 增加超时控制
-            channel_name = self._extract_from_content_disposition(request_url, timeout=2)
-            if channel_name:
-                return channel_name
-
-            return None
-
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(get_channel_name_worker, m3u8_content, url)
-            try:
-                return future.result(timeout=timeout)
-            except Exception as e:
-                logger.error(f"Channel name extraction error: {e}")
-                return None
+        # 方案2: 从Content-Disposition头提取 - 增加超时控制
+        return self._extract_from_content_disposition(url, deadline.child(timeout), timeout=2)
 
     def _extract_from_extinf(self, m3u8_content):
         """
@@ -250,22 +529,12 @@ class ChannelChecker:
         2. 捕获逗号后的显示名称
         3. 无有效名称时返回None
         """
-        extinf_pattern = re.compile(
-            r'^#EXTINF:\s*'
-            r'(?P<duration>-?\d+\.?\d*)\s*'  # 捕获时长
-            r'(?:tvg-name=(?P<qt1>[\'"]?)(?P<tvg_name>[^\'",#]+?)(?P=qt1)\s*)?'  # 修复括号
-            r'(?:,?\s*(?P<display_name>[^#]+?))?'  # 显示名称
-            r'\s*(?:#.*)?$',  # 注释部分
-            re.IGNORECASE | re.MULTILINE
-        )
-        remove_chars = str.maketrans('', '', ',.，。')
-
         candidates = []
         for line in m3u8_content.splitlines():
             if not line.startswith('#EXTINF'):
                 continue
 
-            match = extinf_pattern.match(line)
+            match = EXTINF_NAME_PATTERN.match(line)
             if not match:
                 continue
 
@@ -280,7 +549,7 @@ class ChannelChecker:
             if groups['display_name']:
                 display = groups['display_name'].strip()
                 # 过滤无效名称（纯数字、空值等）
-                cleaned_display = display.translate(remove_chars)
+                cleaned_display = display.translate(EXTINF_NAME_STRIP_TABLE)
                 if cleaned_display:
                     candidates.append(display)
 
@@ -290,32 +559,31 @@ class ChannelChecker:
 
         return None
 
-    def _extract_from_content_disposition(self, url, timeout=2):
+    def _extract_from_content_disposition(self, url, deadline: Deadline, timeout=2):
         """带超时的Content-Disposition提取"""
         try:
-            response = requests.head(url, timeout=(1, timeout - 1), allow_redirects=True)
+            response = http_pool.session().head(url, timeout=deadline.timeout(1, timeout - 1), allow_redirects=True)
             if 'content-disposition' in response.headers:
                 cd_header = response.headers['content-disposition']
-                filename_match = re.findall("filename=(.+)", cd_header)
+                filename_match = CONTENT_DISPOSITION_FILENAME_PATTERN.findall(cd_header)
                 if filename_match:
                     filename = filename_match[0].strip('";')
                     return os.path.splitext(filename)[0]
-        except (Timeout, ConnectionError):
+        except (Timeout, ConnectionError, TimeoutException):
             pass
         except Exception as e:
             logger.error(f"extract_from_content_disposition error: {e}")
 
         return None
 
-    def check_batch(self, threads, task_status, check_sub_m3u8) -> int:
-        task_status_lock = threading.Lock()
-        success_count = Counter()
-        processed_count = Counter()
-        total_count = self._size
+    def check_batch(self, threads, task_status, check_sub_m3u8, engine="thread") -> int:
+        progress = ProgressReporter(task_status, self._size)
 
         # 生成器函数：逐个生成任务，避免一次性创建所有任务列表
         def task_generator():
             for index in range(self._start, self._start + self._size):
+                if self.cancelled:
+                    return
                 url_info = ChannelUrl(self._url.format(i=index))
                 tmp_channel_info = ChannelInfo(id=str(index))
                 tmp_channel_info.add_url(url_info)
@@ -334,95 +602,251 @@ class ChannelChecker:
                 logger.error(f"Error checking {url_info.url}: {e}")
                 return False, None
 
-        # 使用生成器和并行处理
-        optimal_threads = min(threads, os.cpu_count() * Constants.IO_INTENSITY_FACTOR + 1)
-        with ThreadPoolExecutor(max_workers=optimal_threads) as executor:
-            # 使用chunksize提高I/O密集型任务效率
-            results = executor.map(check_task, task_generator(), chunksize=max(1, total_count // 10))
-            for result, channel_info in results:
-                if result and channel_info:
-                    channel_manager.add_channel_info(None, channel_info)
-                    success_count.increment()
-
-                with task_status_lock:
-                    processed_count.increment()
-                    task_status.update({
-                        "progress": round(processed_count.get_value() / total_count * 100, 2),
-                        "processed": processed_count.get_value(),
-                        "success": success_count.get_value(),
-                        "updated_at": int(time.time()),
-                    })
-
-        channel_manager.sort()
-        return success_count.get_value()
-
-    def update_batch_live(self, threads, task_status, check_m3u8_invalid, output_file=None) -> int:
-        """批量更新直播频道信息"""
-        task_status_lock = threading.Lock()
-        success_counter = Counter()
-        processed_counter = Counter()
-        total_count = task_status["total"]
+        def handle_result(result, channel_info):
+            success = bool(result and channel_info)
+            try:
+                if success:
+                    if not channel_info.name:
+                        # 命中检测结果缓存或非 m3u8 地址时未提取频道名称，与网络检测使用相同的默认名称
+                        channel_info.set_name(None)
+                    self._model.add_channel_info(None, channel_info)
+            finally:
+                progress.record_result(success)
+
+        engine = self._check_engine(engine)
+        with progress:
+            self._progress = progress
+            try:
+                if engine == "async":
+                    self._run_async(threads, task_generator(), lambda task, result: handle_result(result, task[0]))
+                elif engine == "process":
+                    self._run_sharded(threads, task_generator(), lambda task, result: handle_result(result, task[0]))
+                else:
+                    # 使用生成器和有界窗口并行处理
+                    optimal_threads = min(threads, os.cpu_count() * Constants.IO_INTENSITY_FACTOR + 1)
+                    self._run_bounded(optimal_threads, task_generator(), check_task,
+                                      lambda item: handle_result(*item))
+            finally:
+                self._progress = None
+
+        probe_cache.flush()
+        self._model.sort()
+        return progress.success
+
+    def update_batch_live(self, threads, task_status, check_m3u8_invalid, engine="thread", incremental=False) -> int:
+        """
+        批量更新直播频道信息
+        增量模式下只检测上次发布后新增的地址和轮换抽检的已有地址，其余地址沿用上次的检测结果
+        检测结果只写入频道集，输出文件在提交后通过 write_output 保存
+        """
+        carried_counter = Counter()
+        sample_round = self._model.publish_round
+        # 任务开始前统计实际任务数，保证首个结果返回时进度即准确
+        total_count = self._model.total_count()
+        if total_count != task_status["total"]:
+            logger.warning(f"Actual task count ({total_count}) differs from expected total ({task_status['total']})")
+        progress = ProgressReporter(task_status, total_count)
+        progress.set_total(total_count)
 
         def process_url(task):
             channel_info, url_info, process_m3u8_invalid = task
             check_result = self.check_single_with_timeout(channel_info, url_info, process_m3u8_invalid)
+            handle_result(task, check_result)
+            return check_result
+
+        def handle_result(task, check_result):
+            channel_info, url_info, _ = task
             try:
-                if check_result:
-                    success_counter.increment()
-                else:
+                if not check_result:
                     channel_info.remove_invalid_url(url_info)
             finally:
-                with task_status_lock:
-                    processed_counter.increment()
-                    processed = processed_counter.get_value()
-                    task_status.update({
-                        "progress": round(processed / total_count * 100, 2),
-                        "processed": processed,
-                        "success": success_counter.get_value(),
-                        "updated_at": int(time.time()),
-                    })
-
-        # 生成任务并立即处理
-        optimal_threads = min(threads, os.cpu_count() * Constants.IO_INTENSITY_FACTOR + 1)
-        with ThreadPoolExecutor(max_workers=optimal_threads) as executor:
-            def task_generator():
-                actual_count = 0
-                # 部分分类组忽略不予处理
-                for group_name in filter(lambda g: not category_manager.is_ignore(g), channel_manager.get_groups()):
-                    chanmel_list = channel_manager.get_channel_list(group_name)
-                    channel_name_list = chanmel_list.get_channel_names()
-                    for channel_name in channel_name_list:
-                        channel_info = chanmel_list.get_channel(channel_name)
-                        url_list = list(channel_info.get_urls())
-                        actual_count += len(url_list)
-                        for url_info in url_list:
-                            yield channel_info, url_info, check_m3u8_invalid
-                # 验证实际任务数
-                nonlocal total_count
-                if actual_count != total_count:
-                    logger.warning(f"Actual task count ({actual_count}) differs from expected total ({total_count})")
-                    total_count = actual_count
-                    task_status["total"] = total_count
-                return actual_count
-
-            # 提交所有任务
-            futures = [executor.submit(process_url, task) for task in task_generator()]
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    logger.error(f"future result error: {e}")
+                progress.record_result(bool(check_result))
 
-        # 最终状态验证
-        final_processed = processed_counter.get_value()
-        final_success = success_counter.get_value()
-        logger.info(f"Final status: Total={total_count}, Processed={final_processed}, Success={final_success}")
+        def task_generator():
+            actual_count = 0
+            # 部分分类组忽略不予处理
+            for group_name in filter(lambda g: not category_manager.is_ignore(g), self._model.get_groups()):
+                chanmel_list = self._model.get_channel_list(group_name)
+                channel_name_list = chanmel_list.get_channel_names()
+                for channel_name in channel_name_list:
+                    channel_info = chanmel_list.get_channel(channel_name)
+                    url_list = list(channel_info.get_urls())
+                    actual_count += len(url_list)
+                    for url_info in url_list:
+                        if self.cancelled:
+                            return actual_count
+                        task = (channel_info, url_info, check_m3u8_invalid)
+                        if incremental and self._carry_forward(url_info, sample_round):
+                            carried_counter.increment()
+                            handle_result(task, True)
+                            continue
+                        yield task
+            # 验证实际任务数
+            if actual_count != total_count:
+                logger.warning(f"Actual task count ({actual_count}) differs from expected total ({total_count})")
+                progress.set_total(actual_count)
+            return actual_count
+
+        engine = self._check_engine(engine)
+        with progress:
+            self._progress = progress
+            try:
+                if engine == "async":
+                    self._run_async(threads, task_generator(), handle_result)
+                elif engine == "process":
+                    self._run_sharded(threads, task_generator(), handle_result)
+                else:
+                    # 按主机交错调度，限制单主机并发
+                    self._scheduler = HostScheduler()
+                    try:
+                        optimal_threads = min(threads, os.cpu_count() * Constants.IO_INTENSITY_FACTOR + 1)
+                        self._dispatch_by_host(optimal_threads, task_generator(), process_url)
+                    finally:
+                        self._scheduler = None
+            finally:
+                self._progress = None
 
-        self._write_data_to_txt_file(output_file)
-        self._write_data_to_m3u_file(output_file)
+        probe_cache.flush()
+        if self.cancelled:
+            logger.info(f"Update cancelled: Processed={progress.processed}, Success={progress.success}")
+            return progress.success
+        self._model.publish()
+
+        # 最终状态验证
+        final_processed = progress.processed
+        final_success = progress.success
+        logger.info(f"Final status: Total={task_status['total']}, Processed={final_processed}, Success={final_success}, "
+                    f"Carried={carried_counter.get_value()}")
         return final_success
 
-    def _write_data_to_txt_file(self, file_path):
+    def _carry_forward(self, url_info: ChannelUrl, sample_round: int) -> bool:
+        """
+        沿用上次发布的检测结果
+        新增地址和本轮抽检桶内的已有地址需要重新检测，其余地址回填上次的速度和子播放列表地址
+        """
+        published = self._model.published_result(url_info.url)
+        if published is None:
+            return False
+
+        bucket = zlib.crc32(url_info.url.encode("utf-8")) % Constants.INCREMENTAL_SAMPLE_BUCKETS
+        if bucket == sample_round % Constants.INCREMENTAL_SAMPLE_BUCKETS:
+            return False
+
+        speed, resolved_url = published
+        url_info.set_speed(speed)
+        url_info.set_resolved_url(resolved_url)
+        return True
+
+    @staticmethod
+    def _run_bounded(threads, tasks, worker, on_done):
+        """以有界窗口流式提交任务：完成一个再补充一个，避免一次性创建全部 Future"""
+        task_iter = iter(tasks)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            window = threads * Constants.TASK_WINDOW_FACTOR
+            in_flight = {executor.submit(worker, task) for task in itertools.islice(task_iter, window)}
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        on_done(future.result())
+                    except Exception as e:
+                        logger.error(f"future result error: {e}")
+                in_flight.update(executor.submit(worker, task) for task in itertools.islice(task_iter, len(done)))
+
+    def _dispatch_by_host(self, threads, tasks, process_url):
+        """
+        流式地从任务生成器补充主机调度器，再下发到线程池
+        调度器中缓冲的任务数保持在预读窗口内，在途任务数不超过线程数
+        """
+        scheduler = self._scheduler
+        lookahead = Constants.TASK_LOOKAHEAD_SIZE
+        task_iter = iter(tasks)
+        exhausted = False
+
+        def refill(limit):
+            nonlocal exhausted
+            while not exhausted and scheduler.pending_count() < limit:
+                task = next(task_iter, None)
+                if task is None:
+                    exhausted = True
+                    break
+                scheduler.add(extract_host(task[1].url), task)
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            in_flight = {}
+            refill(lookahead)
+            while scheduler.has_pending() or in_flight or not exhausted:
+                if self.cancelled and not in_flight:
+                    break
+                while len(in_flight) < threads and not self.cancelled:
+                    item = scheduler.next_task()
+                    if item is None:
+                        # 窗口内的任务都受主机限流时，适度扩大预读范围寻找其他主机的任务
+                        pending = scheduler.pending_count()
+                        if exhausted or pending >= lookahead * Constants.TASK_LOOKAHEAD_MAX_FACTOR:
+                            break
+                        refill(pending + lookahead)
+                        continue
+                    host, task = item
+                    in_flight[executor.submit(process_url, task)] = host
+                refill(lookahead)
+
+                if not in_flight:
+                    # 所有待处理主机都在退避中
+                    time.sleep(max(scheduler.next_ready_delay(), 0.05))
+                    continue
+
+                done, _ = wait(in_flight, timeout=scheduler.next_ready_delay() or None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host = in_flight.pop(future)
+                    try:
+                        scheduler.release(host, future.result())
+                    except Exception as e:
+                        scheduler.release(host, False)
+                        logger.error(f"future result error: {e}")
+
+    def _report_network_error(self, url, error):
+        """将超时、连接错误和限流响应反馈给主机调度器"""
+        if self._scheduler is None:
+            return
+        if isinstance(error, requests.HTTPError):
+            if error.response is None or error.response.status_code not in (429, 503):
+                return
+        elif not isinstance(error, (requests.RequestException, TimeoutException)):
+            return
+        self._scheduler.report_error(extract_host(url))
+
+    @staticmethod
+    def _check_engine(engine) -> str:
+        """校验检测引擎名称"""
+        if engine not in Constants.CHECK_ENGINES:
+            raise ValueError(f"unsupported check engine: {engine}")
+        return engine
+
+    def _run_async(self, concurrency, tasks, on_result):
+        """使用 asyncio 引擎执行检测任务"""
+        from services.async_checker import AsyncChannelChecker
+
+        AsyncChannelChecker(self, concurrency).run(tasks, on_result)
+
+    def _run_sharded(self, threads, tasks, on_result):
+        """使用多进程引擎执行检测任务，threads 为每个进程内的并发数"""
+        from services.sharded_checker import ShardedChannelChecker
+
+        ShardedChannelChecker(self, threads).run(tasks, on_result)
+
+    @classmethod
+    def write_output(cls, file_path, model: ChannelBaseModel = None):
+        """
+        将频道数据保存为 TXT 和 M3U 文件，默认保存当前发布的频道数据
+        工作频道集提交后调用，合并更新时文件包含合并后的全部频道
+        """
+        model = model or channel_manager
+        cls._write_data_to_txt_file(file_path, model)
+        cls._write_data_to_m3u_file(file_path, model)
+
+    @staticmethod
+    def _write_data_to_txt_file(file_path, model: ChannelBaseModel):
         """将分组管理器中的频道信息保存到文件"""
         if not file_path:
             return
@@ -435,12 +859,13 @@ class ChannelChecker:
                 # 添加时间戳
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 f.write(f"# 频道数据导出时间: {timestamp}\n")
-                channel_manager.write_to_txt_file(f)
+                model.write_to_txt_file(f)
             logger.info(f"channel data saved to txt file {file_path}")
         except Exception as e:
             logger.error(f"save data to txt file error: {e}")
 
-    def _write_data_to_m3u_file(self, file_path):
+    @staticmethod
+    def _write_data_to_m3u_file(file_path, model: ChannelBaseModel):
         """将分组管理器中的频道信息保存到文件"""
 
         def replace_file_extension(target_path, new_ext):
@@ -460,7 +885,10 @@ class ChannelChecker:
                 # 添加时间戳
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 f.write(f"# 频道数据导出时间: {timestamp}\n")
-                channel_manager.write_to_m3u_file(f)
+                model.write_to_m3u_file(f)
             logger.info(f"channel data saved to m3u file {new_file_path}")
         except Exception as e:
             logger.error(f"save data to m3u file error: {e}")
+
+
+os.register_at_fork(after_in_child=ChannelChecker._reset_after_fork)
@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.singleton import singleton
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class Job:
+    """排队中或执行中的检测任务"""
+
+    __slots__ = ("task_id", "priority", "func", "future", "cancel_event")
+
+    def __init__(self, task_id: Optional[str], priority: int, func: Callable[[threading.Event], Any]):
+        self.task_id = task_id
+        self.priority = priority
+        self.func = func
+        self.future: Future = Future()
+        # 取消标志，执行中的检测看到后不再发起新的探测
+        self.cancel_event = threading.Event()
+
+    @property
+    def interactive(self) -> bool:
+        return self.priority <= Constants.JOB_PRIORITY_INTERACTIVE
+
+
+@singleton
+class JobScheduler:
+    """
+    检测任务调度器
+    任务按优先级排队，同时执行的任务数不超过工作线程数；部分名额只留给交互式检测，
+    后台批量任务占满其余名额时，交互式检测仍能立即执行
+    """
+
+    def __init__(self, workers: int = None, reserved: int = Constants.JOB_INTERACTIVE_RESERVED):
+        self._workers = max(1, workers or int(os.getenv("JOB_WORKERS", Constants.JOB_WORKERS)))
+        self._background_limit = max(1, self._workers - reserved)
+        self._reset_after_fork()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """子进程中不存在父进程的工作线程，丢弃继承来的队列和线程"""
+        self._queue: List[Tuple[int, int, Job]] = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._running_background = 0
+        self._threads: List[threading.Thread] = []
+        self._condition = threading.Condition()
+
+    def submit(self, func: Callable[[threading.Event], Any], priority: int = Constants.JOB_PRIORITY_BATCH,
+               task_id: str = None) -> Future:
+        """
+        提交任务，func 接收取消标志作为唯一参数
+        同优先级的任务按提交顺序执行，指定 task_id 的任务可以通过 cancel 取消
+        """
+        job = Job(task_id, priority, func)
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._sequence), job))
+            if task_id:
+                self._jobs[task_id] = job
+            self._start_workers()
+            self._condition.notify_all()
+        return job.future
+
+    def run(self, func: Callable[[threading.Event], Any], priority: int = Constants.JOB_PRIORITY_INTERACTIVE,
+            timeout: float = None) -> Any:
+        """提交任务并等待结果"""
+        return self.submit(func, priority).result(timeout)
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        取消任务：排队中的任务不再执行，执行中的任务设置取消标志后由任务自行结束
+        任务不存在或已结束时返回 False
+        """
+        with self._condition:
+            job = self._jobs.pop(task_id, None)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        if job.future.cancel():
+            logger.info(f"job {task_id} cancelled before start")
+        else:
+            logger.info(f"job {task_id} cancellation requested")
+        return True
+
+    def _start_workers(self):
+        if len(self._threads) >= self._workers:
+            return
+        thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_job(self) -> Job:
+        """取出下一个可执行的任务，后台任务名额用尽时只取交互式任务"""
+        while True:
+            if self._queue:
+                _, _, job = self._queue[0]
+                if job.interactive or self._running_background < self._background_limit:
+                    heapq.heappop(self._queue)
+                    return job
+            self._condition.wait()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                background = not job.interactive
+                if background:
+                    self._running_background += 1
+            try:
+                self._execute(job)
+            finally:
+                with self._condition:
+                    if background:
+                        self._running_background -= 1
+                    if job.task_id and self._jobs.get(job.task_id) is job:
+                        del self._jobs[job.task_id]
+                    self._condition.notify_all()
+
+    @staticmethod
+    def _execute(job: Job):
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            job.future.set_result(job.func(job.cancel_event))
+        except BaseException as e:
+            logger.error(f"job {job.task_id or ''} failed: {e}")
+            job.future.set_exception(e)
+
+
+job_scheduler = JobScheduler()
@@ -0,0 +1,84 @@
+import gzip
+import threading
+from typing import Dict, Iterator
+
+from services.channel import ChannelBaseModel, channel_manager
+
+
+class PlaylistSnapshot:
+    """频道列表的不可变快照，发布时已完成排序、渲染和 gzip 压缩，读取时无需加锁"""
+
+    __slots__ = ("version", "_token", "_bodies", "_gzip_bodies")
+
+    def __init__(self, version: int, token: str, bodies: Dict[str, bytes]):
+        self.version = version
+        self._token = token
+        self._bodies = bodies
+        self._gzip_bodies = {fmt: gzip.compress(body, compresslevel=6) for fmt, body in bodies.items()}
+
+    def etag(self, fmt: str) -> str:
+        return f'W/"{fmt}-{self._token}-{self.version}"'
+
+    def body(self, fmt: str) -> bytes:
+        return self._bodies[fmt]
+
+    def gzip_body(self, fmt: str) -> bytes:
+        return self._gzip_bodies[fmt]
+
+    @staticmethod
+    def iter_chunks(body: bytes, chunk_size: int) -> Iterator[memoryview]:
+        """将快照内容按块输出，分块引用快照中的数据，不复制"""
+        view = memoryview(body)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+
+
+class PlaylistPublisher:
+    """
+    频道列表快照发布
+    检测任务提交工作频道集后渲染出新的快照，以一次引用赋值发布；读取方只取当前快照引用，
+    不持有频道数据锁，看到的总是某次提交后的完整数据
+    频道数据未经提交被直接修改时，下次读取重新渲染；发布期间读取方继续使用上一份快照
+    """
+
+    def __init__(self, model: ChannelBaseModel):
+        self._model = model
+        self._lock = threading.Lock()
+        self._snapshot = self._render()
+
+    def _render(self) -> PlaylistSnapshot:
+        # 先取版本号再渲染：渲染期间发生的修改会使快照版本落后，下次读取时重新渲染
+        version = self._model.version
+        bodies = {
+            "txt": self._model.to_txt_string().encode("utf-8"),
+            "m3u": self._model.to_m3u_string().encode("utf-8"),
+        }
+        return PlaylistSnapshot(version, self._model.instance_token, bodies)
+
+    def publish(self) -> PlaylistSnapshot:
+        """渲染并发布当前频道数据的快照"""
+        with self._lock:
+            self._snapshot = self._render()
+            return self._snapshot
+
+    def commit(self, working_set: ChannelBaseModel, replace: bool = True) -> PlaylistSnapshot:
+        """提交工作频道集并发布新快照，提交和渲染完成前读取方使用上一份快照"""
+        with self._lock:
+            self._model.commit(working_set, replace)
+            self._snapshot = self._render()
+            return self._snapshot
+
+    def snapshot(self) -> PlaylistSnapshot:
+        """获取当前快照"""
+        snapshot = self._snapshot
+        if snapshot.version == self._model.version or not self._lock.acquire(blocking=False):
+            return snapshot
+        try:
+            if self._snapshot.version != self._model.version:
+                self._snapshot = self._render()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+
+playlist_publisher = PlaylistPublisher(channel_manager)
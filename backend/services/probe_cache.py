@@ -0,0 +1,197 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.singleton import singleton
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class ProbeResult:
+    """缓存的检测结果"""
+
+    __slots__ = ("valid", "speed", "resolved_url", "checked_at")
+
+    def __init__(self, valid: bool, speed: float, resolved_url: Optional[str], checked_at: float):
+        self.valid = valid
+        self.speed = speed
+        self.resolved_url = resolved_url
+        self.checked_at = checked_at
+
+
+@singleton
+class ProbeCache:
+    """
+    频道检测结果的持久化缓存，以数据流地址为键
+    1. 有效与无效结果分别使用不同的过期时间
+    2. 查询只读内存中的结果表，首次使用时从数据库载入未过期的记录
+    3. 写入和访问记录先进入内存缓冲，由后台线程批量落盘，检测线程不等待数据库
+    4. 超出容量时按最近访问时间淘汰（LRU）
+    """
+
+    _FLUSH_SIZE = 200
+
+    def __init__(self, file: str = None,
+                 valid_ttl: int = Constants.PROBE_CACHE_VALID_TTL,
+                 invalid_ttl: int = Constants.PROBE_CACHE_INVALID_TTL,
+                 max_entries: int = Constants.PROBE_CACHE_MAX_ENTRIES,
+                 flush_interval: float = Constants.PROBE_CACHE_FLUSH_INTERVAL):
+        self._file = file or os.getenv("PROBE_CACHE_FILE", "cache/probe_cache.db")
+        self._valid_ttl = valid_ttl
+        self._invalid_ttl = invalid_ttl
+        self._max_entries = max_entries
+        self._flush_interval = flush_interval
+        self._reset_after_fork()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """子进程中不存在父进程的落盘线程，SQLite 连接也不能跨进程使用"""
+        # 地址 -> (是否有效, 速度, 子播放列表地址, 检测时间)，按最近访问顺序排列
+        self._entries: 'OrderedDict[str, Tuple]' = OrderedDict()
+        self._loaded = False
+        self._pending: Dict[str, Tuple] = {}
+        self._touched: Dict[str, float] = {}
+        # _lock 只保护内存数据；_io_lock 串行化数据库读写，持有 _io_lock 时可以获取 _lock，反之不行
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._conn = None
+        self._flush_requested = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self._file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self._file, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probe_result ("
+                "url TEXT PRIMARY KEY, valid INTEGER NOT NULL, speed REAL NOT NULL, "
+                "resolved_url TEXT, checked_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_probe_result_accessed ON probe_result (accessed_at)")
+        return self._conn
+
+    def _ensure_loaded(self):
+        """首次使用时载入数据库中未过期的记录，载入前已写入内存的结果优先"""
+        if self._loaded:
+            return
+        with self._io_lock:
+            if self._loaded:
+                return
+            try:
+                rows = self._connect().execute(
+                    "SELECT url, valid, speed, resolved_url, checked_at FROM probe_result "
+                    "WHERE checked_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                    (time.time() - max(self._valid_ttl, self._invalid_ttl), self._max_entries)).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"load probe cache failed: {e}")
+                rows = []
+            with self._lock:
+                loaded = OrderedDict((url, (bool(valid), speed, resolved_url, checked_at))
+                                     for url, valid, speed, resolved_url, checked_at in reversed(rows))
+                loaded.update(self._entries)
+                self._entries = loaded
+                self._loaded = True
+
+    def get(self, url: str) -> Optional[ProbeResult]:
+        """获取未过期的检测结果"""
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+
+            valid, speed, resolved_url, checked_at = entry
+            ttl = self._valid_ttl if valid else self._invalid_ttl
+            if now - checked_at > ttl:
+                del self._entries[url]
+                return None
+
+            self._entries.move_to_end(url)
+            self._touched[url] = now
+        return ProbeResult(valid, speed, resolved_url, checked_at)
+
+    def put(self, url: str, valid: bool, speed: float = 0, resolved_url: str = None):
+        """写入检测结果，达到批量阈值时通知后台线程落盘"""
+        entry = (bool(valid), speed or 0, resolved_url, time.time())
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            self._pending[url] = entry
+            pending = len(self._pending)
+        self._start_flusher()
+        if pending >= self._FLUSH_SIZE:
+            self._flush_requested.set()
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="probe-cache-flusher", daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            self._flush_requested.wait(self._flush_interval)
+            self._flush_requested.clear()
+            self.flush()
+
+    def flush(self):
+        """将缓冲的写入和访问记录落盘，并淘汰超出容量的旧记录；写库期间检测线程仍可读写内存"""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                touched, self._touched = self._touched, {}
+            if not pending and not touched:
+                return
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO probe_result "
+                        "(url, valid, speed, resolved_url, checked_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(url, int(valid), speed, resolved_url, checked_at, checked_at)
+                         for url, (valid, speed, resolved_url, checked_at) in pending.items()])
+                    conn.executemany(
+                        "UPDATE probe_result SET accessed_at = ? WHERE url = ?",
+                        [(accessed_at, url) for url, accessed_at in touched.items()])
+                    conn.execute(
+                        "DELETE FROM probe_result WHERE url IN ("
+                        "SELECT url FROM probe_result ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self._max_entries,))
+            except sqlite3.Error as e:
+                logger.error(f"flush probe cache failed: {e}")
+
+    def clear(self) -> int:
+        """清空缓存，返回清除前内存中的记录数"""
+        with self._io_lock:
+            with self._lock:
+                count = len(self._entries)
+                self._entries.clear()
+                self._pending.clear()
+                self._touched.clear()
+                self._loaded = True
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute("DELETE FROM probe_result")
+            except sqlite3.Error as e:
+                logger.error(f"clear probe cache failed: {e}")
+        logger.info(f"probe cache cleared, {count} entries removed")
+        return count
+
+
+probe_cache = ProbeCache()
+atexit.register(probe_cache.flush)
@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class _ThreadCounters:
+    """单个线程的计数器，只由所属线程写入，发布线程只读"""
+
+    __slots__ = ("processed", "success", "stages")
+
+    def __init__(self):
+        self.processed = 0
+        self.success = 0
+        # 阶段名称 -> [次数, 累计耗时（秒）]
+        self.stages: Dict[str, List[float]] = {}
+
+
+class ProgressReporter:
+    """
+    批量检测进度汇总
+    检测线程只累加各自的计数器，不竞争锁；发布线程按固定间隔汇总后写入任务记录，
+    同时计算吞吐量、预计剩余时间和各检测阶段的平均耗时
+    """
+
+    def __init__(self, task_status: Dict, total: int, interval: float = Constants.PROGRESS_PUBLISH_INTERVAL):
+        self._task_status = task_status
+        self._total = total
+        self._interval = interval
+        self._local = threading.local()
+        self._counters: List[_ThreadCounters] = []
+        self._counters_lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._stopped = threading.Event()
+        self._publisher: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'ProgressReporter':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._publisher = threading.Thread(target=self._run, name="progress-publisher", daemon=True)
+        self._publisher.start()
+
+    def stop(self):
+        """停止发布线程并写入最终进度"""
+        self._stopped.set()
+        if self._publisher is not None:
+            self._publisher.join()
+            self._publisher = None
+        self.publish()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"publish progress error: {e}")
+
+    def _thread_counters(self) -> _ThreadCounters:
+        counters = getattr(self._local, "counters", None)
+        if counters is None:
+            counters = self._local.counters = _ThreadCounters()
+            with self._counters_lock:
+                self._counters.append(counters)
+        return counters
+
+    def record_result(self, success: bool):
+        """记录一个地址的检测结果"""
+        counters = self._thread_counters()
+        counters.processed += 1
+        if success:
+            counters.success += 1
+
+    def record_stage(self, stage: str, elapsed: float):
+        """记录一个检测阶段的耗时（秒）"""
+        stages = self._thread_counters().stages
+        stats = stages.get(stage)
+        if stats is None:
+            stages[stage] = [1, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def set_total(self, total: int):
+        self._total = total
+        self._task_status["total"] = total
+
+    @property
+    def processed(self) -> int:
+        with self._counters_lock:
+            return sum(counters.processed for counters in self._counters)
+
+    @property
+    def success(self) -> int:
+        with self._counters_lock:
+            return sum(counters.success for counters in self._counters)
+
+    def _stage_summary(self) -> Dict[str, Dict]:
+        merged: Dict[str, List[float]] = {}
+        with self._counters_lock:
+            for counters in self._counters:
+                for stage, (count, elapsed) in list(counters.stages.items()):
+                    stats = merged.setdefault(stage, [0, 0.0])
+                    stats[0] += count
+                    stats[1] += elapsed
+        return {stage: {"count": int(count), "avg_ms": round(elapsed / count * 1000, 1)}
+                for stage, (count, elapsed) in merged.items() if count}
+
+    def publish(self):
+        """汇总各线程的计数器并写入任务记录"""
+        processed = self.processed
+        elapsed = time.monotonic() - self._started_at
+        throughput = processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self._total - processed)
+        self._task_status.update({
+            "progress": round(processed / self._total * 100, 2) if self._total else 100.0,
+            "processed": processed,
+            "success": self.success,
+            "throughput": round(throughput, 1),
+            "eta": int(remaining / throughput) if throughput > 0 else None,
+            "stages": self._stage_summary(),
+            "updated_at": int(time.time()),
+        })
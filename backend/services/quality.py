@@ -0,0 +1,149 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from fractions import Fraction
+from typing import Optional
+
+import av
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.process_context import process_context
+from core.singleton import singleton
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class StreamQuality:
+    """视频流质量信息：分辨率、编码、帧率和实际码率"""
+
+    __slots__ = ("width", "height", "codec", "fps", "bitrate")
+
+    def __init__(self, width: int, height: int, codec: str, fps: float, bitrate: int):
+        self.width = width
+        self.height = height
+        self.codec = codec
+        self.fps = fps
+        self.bitrate = bitrate  # 单位：bit/s
+
+    @property
+    def resolution(self) -> Optional[str]:
+        return f"{self.width}x{self.height}" if self.width and self.height else None
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def __repr__(self):
+        return (f"StreamQuality(resolution={self.resolution}, codec={self.codec}, "
+                f"fps={self.fps}, bitrate={self.bitrate})")
+
+
+def _probe(data: bytes) -> Optional[StreamQuality]:
+    """在内存中解复用TS数据，提取视频流信息（在子进程中执行）"""
+    with av.open(io.BytesIO(data), format="mpegts") as container:
+        video = next((stream for stream in container.streams if stream.type == "video"), None)
+        if video is None:
+            return None
+
+        # 按视频时间戳跨度和全部数据包大小估算实际码率
+        total_bytes = 0
+        first_pts = last_pts = None
+        for packet in container.demux():
+            total_bytes += packet.size
+            if packet.stream is not video or packet.pts is None:
+                continue
+            first_pts = packet.pts if first_pts is None else min(first_pts, packet.pts)
+            last_pts = packet.pts if last_pts is None else max(last_pts, packet.pts)
+
+        duration = float((last_pts - first_pts) * video.time_base) if first_pts is not None else 0.0
+        bitrate = int(total_bytes * 8 / duration) if duration > 0 else (container.bit_rate or 0)
+        rate = video.average_rate or video.guessed_rate
+        codec = video.codec_context
+        return StreamQuality(codec.width or 0, codec.height or 0, codec.name,
+                             round(float(Fraction(rate)), 2) if rate else 0.0, bitrate)
+
+
+def _safe_probe(data: bytes) -> Optional[StreamQuality]:
+    try:
+        return _probe(data)
+    except (av.FFmpegError, ValueError, ZeroDivisionError):
+        return None
+
+
+@singleton
+class QualityProbe:
+    """
+    视频流质量探测：解复用已下载的TS采样数据
+    解复用在有界进程池中执行，不占用网络检测线程；排队的探测数量达到上限时直接跳过
+    """
+
+    def __init__(self, workers: int = None):
+        self._workers = workers or int(os.getenv("QUALITY_PROBE_WORKERS", Constants.QUALITY_PROBE_WORKERS))
+        self._slots = threading.BoundedSemaphore(self._workers * 2)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """子进程中不能复用父进程的进程池"""
+        self._slots = threading.BoundedSemaphore(self._workers * 2)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=process_context())
+            return self._executor
+
+    def _submit(self, data: bytes) -> Optional[Future]:
+        if not data or not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(_safe_probe, data[:Constants.QUALITY_PROBE_BYTES])
+        except Exception as e:
+            self._slots.release()
+            logger.warning(f"Quality probe submit failed: {e}")
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def probe(self, data: bytes, timeout: float = Constants.QUALITY_PROBE_TIMEOUT) -> Optional[StreamQuality]:
+        """探测采样数据的视频质量，超时或无法解析时返回 None"""
+        future = self._submit(data)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.debug(f"Quality probe timed out after {timeout} seconds")
+        except Exception as e:
+            logger.debug(f"Quality probe error: {e}")
+        return None
+
+    async def probe_async(self, data: bytes,
+                          timeout: float = Constants.QUALITY_PROBE_TIMEOUT) -> Optional[StreamQuality]:
+        """asyncio 引擎使用的探测方法，等待期间不阻塞事件循环"""
+        future = self._submit(data)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            logger.debug(f"Quality probe timed out after {timeout} seconds")
+        except Exception as e:
+            logger.debug(f"Quality probe error: {e}")
+        return None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+quality_probe = QualityProbe()
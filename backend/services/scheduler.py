@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from core.constants import Constants
+
+
+class _HostState:
+    """单个主机的调度状态"""
+
+    def __init__(self, max_inflight: int):
+        self.queue: Deque[Any] = deque()
+        self.inflight = 0
+        self.limit = float(max_inflight)
+        self.failures = 0
+        self.backoff_until = 0.0
+
+
+class HostScheduler:
+    """
+    按主机交错调度检测任务
+    1. 各主机的任务轮询出队，避免同一主机的任务集中下发
+    2. 限制单主机同时在途的请求数
+    3. 主机出现超时/连接错误时降低并发上限并指数退避，成功后逐步恢复
+    """
+
+    def __init__(self, max_per_host: int = Constants.HOST_MAX_INFLIGHT,
+                 backoff_base: float = Constants.HOST_BACKOFF_BASE,
+                 backoff_max: float = Constants.HOST_BACKOFF_MAX):
+        self._max_per_host = max(1, max_per_host)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._hosts: Dict[Optional[str], _HostState] = {}
+        self._ready: Deque[Optional[str]] = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _state(self, host) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self._max_per_host)
+        return state
+
+    def add(self, host: Optional[str], task: Any):
+        """按主机入队一个任务"""
+        with self._lock:
+            state = self._state(host)
+            if not state.queue:
+                self._ready.append(host)
+            state.queue.append(task)
+            self._pending += 1
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return self._pending > 0
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def next_task(self) -> Optional[Tuple[Optional[str], Any]]:
+        """轮询取出下一个可下发的任务，所有主机都不可下发时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self._ready)):
+                host = self._ready.popleft()
+                state = self._hosts[host]
+                if state.inflight >= int(state.limit) or state.backoff_until > now:
+                    self._ready.append(host)
+                    continue
+
+                task = state.queue.popleft()
+                state.inflight += 1
+                self._pending -= 1
+                if state.queue:
+                    self._ready.append(host)
+                return host, task
+        return None
+
+    def next_ready_delay(self) -> float:
+        """距离最近一个退避主机恢复可用的等待时间（秒）"""
+        now = time.monotonic()
+        with self._lock:
+            delays = [self._hosts[host].backoff_until - now for host in self._ready]
+            waiting = [delay for delay in delays if delay > 0]
+            return min(waiting) if waiting else 0.0
+
+    def release(self, host: Optional[str], ok: bool):
+        """任务结束，归还主机并发额度；检测成功时逐步恢复并发上限"""
+        with self._lock:
+            state = self._state(host)
+            state.inflight = max(0, state.inflight - 1)
+            if ok:
+                state.failures = 0
+                state.limit = min(float(self._max_per_host), state.limit + 1)
+
+    def report_error(self, host: Optional[str]):
+        """主机出现超时、连接错误或限流响应：并发上限减半并指数退避"""
+        with self._lock:
+            state = self._state(host)
+            state.failures += 1
+            state.limit = max(1.0, state.limit / 2)
+            delay = min(self._backoff_max, self._backoff_base * (2 ** (state.failures - 1)))
+            state.backoff_until = max(state.backoff_until, time.monotonic() + delay)
@@ -0,0 +1,183 @@
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.process_context import process_context
+from models.channel_info import ChannelInfo, ChannelUrl
+from services.scheduler import HostScheduler
+from utils.url_util import extract_host
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 子进程内复用的检测器，主机调度器的退避状态在同一进程处理的多个分块之间保留
+_shard_checker = None
+
+
+def _init_shard(cancel_event, probe_quality: bool):
+    """子进程初始化：创建检测器，取消标志由主进程设置后子进程停止发起新的检测"""
+    global _shard_checker
+    from services.checker import ChannelChecker
+
+    # 检测结果缓存由主进程统一读写
+    _shard_checker = ChannelChecker(use_cache=False, probe_quality=probe_quality, cancel_event=cancel_event)
+    _shard_checker._scheduler = HostScheduler()
+
+
+def _check_chunk(entries: List[Tuple[str, bool, str, Optional[str]]], threads: int) -> List[Optional[tuple]]:
+    """
+    子进程中检测一个分块，entries 为 (地址, 是否检测子播放列表, 频道ID, 频道名称)
+    返回与 entries 一一对应的 (结果, 速度, 子播放列表地址, 质量信息, 频道名称, 是否超时)，
+    任务取消后未检测的地址对应 None
+    """
+    checker = _shard_checker
+    results: List[Optional[tuple]] = [None] * len(entries)
+
+    def tasks():
+        for index, (url, check_sub_m3u8, channel_id, name) in enumerate(entries):
+            if checker.cancelled:
+                return
+            channel_info = ChannelInfo(channel_id, name)
+            url_info = ChannelUrl(url)
+            channel_info.add_url(url_info)
+            yield channel_info, url_info, check_sub_m3u8, index
+
+    def process_url(task):
+        channel_info, url_info, check_sub_m3u8, index = task
+        if checker.cancelled:
+            return False
+        result, timed_out = checker._run_check(channel_info, url_info, check_sub_m3u8)
+        results[index] = (result, url_info.speed, url_info.resolved_url, url_info.quality, channel_info.name,
+                          timed_out)
+        return result
+
+    checker._dispatch_by_host(threads, tasks(), process_url)
+    return results
+
+
+class ShardedChannelChecker:
+    """
+    多进程检测引擎
+    按主机将任务分片到多个进程，每个进程内使用线程池和主机调度器并发检测，
+    正则解析、播放列表解析等CPU密集的工作分散到各个核心；
+    同一分片同时只有一个分块在途，单主机并发限制在分片内依然有效，结果按分块流式回传主进程
+    """
+
+    def __init__(self, checker, threads: int, processes: int = None,
+                 chunk_size: int = Constants.SHARD_CHUNK_SIZE):
+        self._checker = checker
+        self._threads = max(1, threads)
+        self._processes = processes or int(os.getenv("CHECK_PROCESSES", Constants.CHECK_PROCESSES)) \
+            or os.cpu_count() or 1
+        self._chunk_size = max(1, chunk_size)
+
+    def _shard_of(self, url: str) -> int:
+        return zlib.crc32((extract_host(url) or "").encode("utf-8")) % self._processes
+
+    def run(self, tasks: Iterable[Tuple[ChannelInfo, ChannelUrl, bool]],
+            on_result: Callable[[Tuple[ChannelInfo, ChannelUrl, bool], bool], None]) -> None:
+        """执行全部检测任务，每完成一个任务在主进程中回调一次 on_result"""
+        task_iter = iter(tasks)
+        exhausted = False
+        buffers: List[list] = [[] for _ in range(self._processes)]
+        buffered = 0
+        # 每个分片预读的任务数上限，保证内存占用有界
+        buffer_limit = self._processes * self._chunk_size * 2
+        running: Dict = {}
+        context = process_context()
+        cancel_event = context.Event()
+
+        with ProcessPoolExecutor(max_workers=self._processes, mp_context=context, initializer=_init_shard,
+                                 initargs=(cancel_event, self._checker._probe_quality)) as executor:
+            while True:
+                while not exhausted and buffered < buffer_limit:
+                    task = next(task_iter, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    # 命中检测结果缓存的任务直接在主进程完成
+                    cached = self._checker._cached_result(task[1], task[2])
+                    if cached is not None:
+                        self._notify(on_result, task, cached)
+                        continue
+                    buffers[self._shard_of(task[1].url)].append(task)
+                    buffered += 1
+
+                if self._checker.cancelled:
+                    # 任务已取消：通知子进程停止检测，丢弃尚未下发的任务，等待执行中的分块返回
+                    cancel_event.set()
+                    exhausted = True
+                    buffers = [[] for _ in range(self._processes)]
+                    buffered = 0
+
+                busy = {shard for shard, _ in running.values()}
+                for shard, buffer in enumerate(buffers):
+                    if shard in busy or not buffer or (len(buffer) < self._chunk_size and not exhausted):
+                        continue
+                    chunk = buffer[:self._chunk_size]
+                    del buffer[:self._chunk_size]
+                    buffered -= len(chunk)
+                    entries = [(url_info.url, check_sub_m3u8, channel_info.id, channel_info.name)
+                               for channel_info, url_info, check_sub_m3u8 in chunk]
+                    try:
+                        future = executor.submit(_check_chunk, entries, self._threads)
+                    except BrokenProcessPool as e:
+                        # 进程池已损坏，之后的分块都在主进程中检测
+                        logger.error(f"shard pool broken, checking {len(chunk)} urls in process: {e}")
+                        self._check_locally(chunk, on_result)
+                        continue
+                    running[future] = (shard, chunk)
+
+                if not running:
+                    break
+
+                done, _ = wait(running, timeout=Constants.SHARD_CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, chunk = running.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # 子进程故障不代表地址无效，在主进程中重新检测该分块
+                        logger.error(f"shard worker failed, checking {len(chunk)} urls in process: {e}")
+                        self._check_locally(chunk, on_result)
+                        continue
+                    for task, outcome in zip(chunk, results):
+                        self._notify(on_result, task, self._apply(task, outcome))
+
+    def _check_locally(self, chunk, on_result):
+        """在主进程中检测一个分块，子进程故障时使用"""
+        def process(task):
+            channel_info, url_info, check_sub_m3u8 = task
+            self._notify(on_result, task,
+                         self._checker.check_single_with_timeout(channel_info, url_info, check_sub_m3u8))
+
+        with ThreadPoolExecutor(max_workers=self._threads) as executor:
+            list(executor.map(process, chunk))
+
+    def _apply(self, task, outcome: Optional[tuple]) -> bool:
+        """将子进程的检测结果写回主进程中的频道地址"""
+        channel_info, url_info, check_sub_m3u8 = task
+        if outcome is None:
+            return False
+
+        result, speed, resolved_url, quality, name, timed_out = outcome
+        if result:
+            url_info.set_speed(speed)
+            url_info.set_resolved_url(resolved_url)
+            if quality is not None:
+                url_info.set_quality(quality)
+            if name and not channel_info.name:
+                channel_info.set_name(name)
+        if not timed_out:
+            self._checker._cache_result(url_info, check_sub_m3u8, result)
+        return result
+
+    @staticmethod
+    def _notify(on_result, task, result: bool):
+        try:
+            on_result(task, result)
+        except Exception as e:
+            logger.error(f"shard result callback error: {e}")
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.singleton import singleton
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class CachedSource:
+    """缓存的直播源文件信息"""
+
+    __slots__ = ("url", "etag", "last_modified", "encoding", "fetched_at")
+
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                 encoding: Optional[str], fetched_at: float):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+        self.fetched_at = fetched_at
+
+    @property
+    def validator(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.etag, self.last_modified
+
+
+@singleton
+class SourceCache:
+    """
+    直播源文件的磁盘缓存（条件请求）
+    1. 记录上游返回的 ETag/Last-Modified，下次请求时携带 If-None-Match/If-Modified-Since
+    2. 上游不可访问时回退到最近一次成功下载的内容
+    3. 按文件版本缓存解析结果，上游返回 304 时直接复用，无需重新解析；
+       解析结果按记录总数限制内存占用，被淘汰的直播源重新解析磁盘上的缓存文件
+    """
+
+    def __init__(self, directory: str = None, max_records: int = Constants.SOURCE_RECORDS_CACHE_SIZE):
+        self._directory = directory or os.getenv("SOURCE_CACHE_DIR", "cache/sources")
+        self._meta: Dict[str, CachedSource] = {}
+        self._records: 'OrderedDict[Tuple[str, str], Tuple[Tuple, List[tuple]]]' = OrderedDict()
+        self._record_count = 0
+        self._max_records = max_records
+        self._lock = threading.Lock()
+
+    def _path(self, url: str, suffix: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._directory, f"{key}.{suffix}")
+
+    def get(self, url: str) -> Optional[CachedSource]:
+        """获取缓存的文件信息，内存中没有时从磁盘读取"""
+        with self._lock:
+            cached = self._meta.get(url)
+        if cached is not None:
+            return cached
+
+        try:
+            with open(self._path(url, "json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._path(url, "body")):
+            return None
+
+        cached = CachedSource(url, meta.get("etag"), meta.get("last_modified"),
+                              meta.get("encoding"), meta.get("fetched_at", 0))
+        with self._lock:
+            self._meta[url] = cached
+        return cached
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """生成条件请求头"""
+        cached = self.get(url)
+        headers = {}
+        if cached is None:
+            return headers
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def load(self, url: str) -> Optional[str]:
+        """读取最近一次成功下载的内容"""
+        cached = self.get(url)
+        if cached is None:
+            return None
+        try:
+            with open(self._path(url, "body"), "rb") as f:
+                return f.read().decode(cached.encoding or "utf-8", errors="replace")
+        except OSError as e:
+            logger.error(f"read source cache {url} failed: {e}")
+            return None
+
+    def store(self, url: str, headers: Mapping[str, str], encoding: Optional[str], body: bytes):
+        """保存下载成功的内容，并清除该地址旧版本的解析结果"""
+        cached = CachedSource(url, headers.get("ETag"), headers.get("Last-Modified"), encoding, time.time())
+        with self._lock:
+            self._meta[url] = cached
+            for key in [key for key in self._records if key[0] == url]:
+                self._drop_records(key)
+
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            self._write(self._path(url, "body"), body)
+            meta = {"url": url, "etag": cached.etag, "last_modified": cached.last_modified,
+                    "encoding": encoding, "fetched_at": cached.fetched_at}
+            self._write(self._path(url, "json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.error(f"write source cache {url} failed: {e}")
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # 先写临时文件再替换，避免中途失败留下不完整的缓存
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_records(self, url: str, kind: str) -> Optional[List[tuple]]:
+        """获取当前缓存版本对应的解析结果"""
+        cached = self.get(url)
+        if cached is None:
+            return None
+        with self._lock:
+            entry = self._records.get((url, kind))
+            if entry is not None:
+                self._records.move_to_end((url, kind))
+        if entry is None or entry[0] != cached.validator:
+            return None
+        return entry[1]
+
+    def put_records(self, url: str, kind: str, records: List[tuple]):
+        """保存当前缓存版本的解析结果，kind 区分同一文件的不同解析方式"""
+        cached = self.get(url)
+        if cached is None:
+            return
+        if len(records) > self._max_records:
+            return
+        with self._lock:
+            self._drop_records((url, kind))
+            self._records[(url, kind)] = (cached.validator, records)
+            self._record_count += len(records)
+            # 按记录总数淘汰最久未使用的解析结果
+            while self._record_count > self._max_records:
+                self._drop_records(next(iter(self._records)))
+
+    def _drop_records(self, key: Tuple[str, str]):
+        entry = self._records.pop(key, None)
+        if entry is not None:
+            self._record_count -= len(entry[1])
+
+
+source_cache = SourceCache()
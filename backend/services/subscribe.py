@@ -5,6 +5,7 @@ import requests
 
 from core.constants import Constants
 from core.logger_factory import LoggerFactory
+from core.patterns import SUBSCRIBE_REMOVE_PATTERN
 from core.singleton import singleton
 from utils.base64_util import base64_decode
 from utils.url_util import url_encode
@@ -20,7 +21,6 @@ class SubscribeService:
         self._config = "config/ACL4SSR_Online_Mini_MultiMode.ini"
         self._params = "clash.dns=1&insert=false&emoji=true&new_name=true&flag=meta"
 
-        self._pattern_2empty = r'dafei\.de |-[A-Za-z\s,\. ]+- '
         # self._replace_empty_reg = r'[\U0001F1E6-\U0001F1FF]{2} |dafei\.de '
         self._regex_filter = re.compile(r'^.*(v2ray-plugin|北京|上海|广州|杭州|合肥|惠州|青岛).*$', re.MULTILINE)
         self._urls: Dict[str, str] = {
@@ -60,13 +60,13 @@ class SubscribeService:
 
     def _replace(self, line: str) -> str:
         """替换数据行"""
-        return re.sub(self._pattern_2empty, '', line)
+        return SUBSCRIBE_REMOVE_PATTERN.sub('', line)
 
     def get_clash_subscribe(self, clash_key: str) -> str:
         try:
             url = clash_key if 'http' in clash_key else self._urls.get(clash_key)
             decoded_text = self._convert_to_v2ray(url)
-            sub_url_text = re.sub(re.compile(r'\n'), '|', decoded_text)
+            sub_url_text = decoded_text.replace('\n', '|')
             return self._convert_to_clash(sub_url_text)
         except Exception as e:
             logger.error(f"get clash subscribe failed: {e}")
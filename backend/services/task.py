@@ -1,19 +1,102 @@
+import atexit
 import threading
 import time
+from typing import Callable, Dict, Iterable, Optional
 from uuid import uuid4
 
+from core.constants import Constants
 from core.singleton import singleton
+from services.task_events import TERMINAL_STATUSES, task_event_broker
+from services.task_store import TaskStore, create_task_store
+
+
+class TaskRecord(dict):
+    """
+    任务状态记录
+    检测线程直接修改记录中的字段，修改后通知任务管理器写回存储
+    字段修改和 snapshot 复制在记录自身的锁内进行，读取方复制记录时不会遇到并发修改
+    """
+
+    __slots__ = ("_on_change", "_lock")
+
+    def __init__(self, data: Dict, on_change: Optional[Callable[['TaskRecord', Iterable[str]], None]] = None):
+        super().__init__(data)
+        self._on_change = on_change
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+        self._changed((key,))
+
+    def update(self, *args, **kwargs):
+        fields = dict(*args, **kwargs)
+        with self._lock:
+            super().update(fields)
+        self._changed(fields.keys())
+
+    def set_fields(self, fields: Dict):
+        """修改字段，不触发变更通知"""
+        with self._lock:
+            super().update(fields)
+
+    def snapshot(self) -> Dict:
+        """复制当前记录"""
+        with self._lock:
+            return dict(self)
+
+    def _changed(self, keys: Iterable[str]):
+        if self._on_change is not None:
+            self._on_change(self, keys)
 
 
 @singleton
 class TaskManager:
-    def __init__(self):
-        self._tasks = {}
+    """
+    任务管理器，任务存储可插拔（环境变量 TASK_STORE：memory / sqlite）
+    使用共享存储时，本进程创建的任务保留一份活动记录，进度字段的修改按时间间隔合并写回，
+    状态、结果等其他字段的修改立即写回，其他工作进程读取存储即可获得任务状态
+    """
+
+    # 合并写回的进度字段
+    _PROGRESS_FIELDS = frozenset({"progress", "processed", "success", "total", "throughput", "eta", "stages",
+                                  "updated_at"})
+
+    def __init__(self, store: TaskStore = None, flush_interval: float = Constants.TASK_FLUSH_INTERVAL):
+        self._store = store or create_task_store()
+        self._flush_interval = flush_interval
+        self._live: Dict[str, TaskRecord] = {}
+        self._dirty: Dict[str, float] = {}
         self._lock = threading.RLock()
 
+    def _on_change(self, task: TaskRecord, keys: Iterable[str]):
+        task_event_broker.publish(task["id"])
+        if not self._store.shared:
+            return
+        with self._lock:
+            now = time.monotonic()
+            first_dirty = self._dirty.setdefault(task["id"], now)
+            if self._PROGRESS_FIELDS.issuperset(keys) and now - first_dirty < self._flush_interval:
+                return
+            self._save(task)
+
+    def _save(self, task: TaskRecord):
+        self._dirty.pop(task["id"], None)
+        self._store.save(task.snapshot())
+
+    def flush(self):
+        """写回所有尚未落盘的进度修改"""
+        with self._lock:
+            for task_id in list(self._dirty):
+                task = self._live.get(task_id)
+                if task is None:
+                    self._dirty.pop(task_id, None)
+                else:
+                    self._save(task)
+
     def create_task(self, **kwargs):
         task_id = str(uuid4()).replace('-', '')
-        task = {
+        task = TaskRecord({
             "id": task_id,
             "type": kwargs['type'],
             "description": kwargs['description'],
@@ -27,59 +110,110 @@ class TaskManager:
             "updated_at": int(time.time()),
             "result": None,
             "error": None
-        }
+        })
 
         with self._lock:
-            self._tasks[task_id] = task
-            task["status"] = "pending"
+            task.set_fields({"status": "pending"})
+            self._store.insert(task)
+            self._live[task_id] = task
+            task._on_change = self._on_change
 
         return task_id
 
     def clear(self):
         with self._lock:
-            self._tasks.clear()
+            self._live.clear()
+            self._dirty.clear()
+            self._store.clear()
+
+    def clear_finished(self) -> int:
+        """删除已结束的任务记录，排队中和执行中的任务保留，返回删除的数量"""
+        with self._lock:
+            removed = 0
+            for data in self._store.list():
+                task_id = data["id"]
+                # 本进程的活动记录比存储中的更新
+                task = self._live.get(task_id, data)
+                if task["status"] not in TERMINAL_STATUSES:
+                    continue
+                self._live.pop(task_id, None)
+                self._dirty.pop(task_id, None)
+                if self._store.delete(task_id):
+                    removed += 1
+            return removed
 
     def get_tasks(self):
         with self._lock:
-            return [{"id": task["id"], "status": task["status"]} for task in self._tasks.values()]
+            tasks = {task["id"]: task for task in self._store.list()}
+            if self._store.shared:
+                # 本进程的活动记录比存储中的更新
+                tasks.update((task_id, task) for task_id, task in self._live.items() if task_id in tasks)
+            return [{"id": task["id"], "status": task["status"]} for task in tasks.values()]
+
+    def is_local(self, task_id) -> bool:
+        """任务是否由本进程创建并执行"""
+        return task_id in self._live
 
     def get_task(self, task_id):
         with self._lock:
-            return self._tasks.get(task_id)
+            task = self._live.get(task_id)
+            if task is not None:
+                return task
+            # 其他工作进程创建的任务，返回存储中的快照
+            data = self._store.load(task_id)
+            return TaskRecord(data) if data is not None else None
+
+    def _find(self, task_id) -> Optional[TaskRecord]:
+        task = self._live.get(task_id)
+        if task is None:
+            data = self._store.load(task_id)
+            if data is not None:
+                task = TaskRecord(data)
+        return task
 
     def update_task(self, task_id, **kwargs):
         with self._lock:
-            if task_id not in self._tasks:
+            task = self._find(task_id)
+            if task is None:
                 return False
 
-            if 'status' in kwargs and kwargs['status'] not in {'pending', 'running', 'completed', 'failed'}:
+            if 'status' in kwargs and kwargs['status'] not in {'pending', 'running', 'completed', 'failed', 'error',
+                                                                     'cancelled'}:
                 return False
 
-            task = self._tasks[task_id]
-            task.update(kwargs)
+            task.set_fields(kwargs)
             task["updated_at"] = int(time.time())
+            if self._store.shared:
+                self._save(task)
+            task_event_broker.publish(task_id)
             return True
 
     def delete_task(self, task_id):
         with self._lock:
-            task = self._tasks.get(task_id)
+            task = self._find(task_id)
             if not task:
                 return False
 
-            if task["status"] not in {"pending", "completed", "failed"}:
+            if task["status"] not in {"pending", "completed", "failed", "error", "cancelled"}:
                 return False
 
-            return self._tasks.pop(task_id, None) is not None
+            self._live.pop(task_id, None)
+            self._dirty.pop(task_id, None)
+            return self._store.delete(task_id)
 
     def safe_get_and_update_task(self, task_id, update_func):
         with self._lock:
-            task = self._tasks.get(task_id)
+            task = self._find(task_id)
             if not task:
                 return False
 
             update_func(task)
             task["updated_at"] = int(time.time())
+            if self._store.shared:
+                self._save(task)
+            task_event_broker.publish(task_id)
             return True
 
 
 task_manager = TaskManager()
+atexit.register(task_manager.flush)
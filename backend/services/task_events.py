@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from core.constants import Constants
+from core.logger_factory import LoggerFactory
+from core.singleton import singleton
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 任务结束状态，推送最终结果后关闭事件流
+TERMINAL_STATUSES = frozenset({"completed", "failed", "error", "cancelled"})
+
+
+class TaskSubscription:
+    """单个订阅者：任务记录变化时唤醒其所在事件循环中的等待"""
+
+    __slots__ = ("task_id", "_loop", "_event")
+
+    def __init__(self, task_id: str, loop: asyncio.AbstractEventLoop):
+        self.task_id = task_id
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self):
+        # 已有未处理的通知时不再重复投递，多次变化合并为一次唤醒
+        if self._event.is_set():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """等待下一次变化，超时返回 False"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+@singleton
+class TaskEventBroker:
+    """
+    任务变化通知
+    发布方只读取订阅者元组并投递唤醒，不加锁；订阅和取消订阅时整体替换元组
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Tuple[TaskSubscription, ...]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_id: str) -> TaskSubscription:
+        subscription = TaskSubscription(task_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[task_id] = self._subscribers.get(task_id, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskSubscription):
+        with self._lock:
+            remaining = tuple(s for s in self._subscribers.get(subscription.task_id, ()) if s is not subscription)
+            if remaining:
+                self._subscribers[subscription.task_id] = remaining
+            else:
+                self._subscribers.pop(subscription.task_id, None)
+
+    def publish(self, task_id: str):
+        for subscription in self._subscribers.get(task_id, ()):
+            subscription.notify()
+
+
+task_event_broker = TaskEventBroker()
+
+
+def _format_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def task_event_stream(task_id: str, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """
+    任务进度事件流（Server-Sent Events）
+    首个 progress 事件为完整的任务记录，之后只推送变化的字段；任务结束时推送 end 事件并关闭
+    本进程执行的任务由变化通知驱动，其他工作进程的任务按固定间隔读取共享存储
+    """
+    from services.task import task_manager
+
+    subscription = task_event_broker.subscribe(task_id)
+    try:
+        last: Dict = {}
+        idle = 0.0
+        while True:
+            # 共享存储（SQLite）读取会阻塞，放到线程池执行，避免阻塞事件循环
+            task = await run_in_threadpool(task_manager.get_task, task_id)
+            if task is None:
+                yield _format_event("error", {"id": task_id, "error": "task not found"})
+                return
+
+            snapshot = task.snapshot()
+            delta = {key: value for key, value in snapshot.items() if key not in last or last[key] != value}
+            if delta:
+                yield _format_event("progress", delta)
+                last = snapshot
+                idle = 0.0
+
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                yield _format_event("end", {"id": task_id, "status": snapshot["status"],
+                                            "result": snapshot.get("result"), "error": snapshot.get("error")})
+                return
+
+            timeout = Constants.TASK_EVENT_POLL_INTERVAL
+            if task_manager.is_local(task_id):
+                timeout = Constants.TASK_EVENT_KEEPALIVE
+            if not await subscription.wait(timeout):
+                idle += timeout
+                if idle >= Constants.TASK_EVENT_KEEPALIVE:
+                    # 注释行保持连接，同时及时发现客户端断开
+                    yield ": keepalive\n\n"
+                    idle = 0.0
+            if await is_disconnected():
+                return
+    finally:
+        task_event_broker.unsubscribe(subscription)
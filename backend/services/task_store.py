@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from core.logger_factory import LoggerFactory
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class TaskStore(ABC):
+    """
+    任务存储接口
+    shared 为 True 表示存储可被多个进程共享，任务状态的修改需要写回存储
+    """
+
+    shared = False
+
+    @abstractmethod
+    def insert(self, task: Dict):
+        pass
+
+    @abstractmethod
+    def load(self, task_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def save(self, task: Dict):
+        pass
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def list(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class MemoryTaskStore(TaskStore):
+    """进程内存储，任务记录对象本身即存储内容"""
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict] = {}
+
+    def insert(self, task: Dict):
+        self._tasks[task["id"]] = task
+
+    def load(self, task_id: str) -> Optional[Dict]:
+        return self._tasks.get(task_id)
+
+    def save(self, task: Dict):
+        self._tasks[task["id"]] = task
+
+    def delete(self, task_id: str) -> bool:
+        return self._tasks.pop(task_id, None) is not None
+
+    def list(self) -> List[Dict]:
+        return list(self._tasks.values())
+
+    def clear(self):
+        self._tasks.clear()
+
+
+class SqliteTaskStore(TaskStore):
+    """SQLite（WAL 模式）存储，同一主机上的多个工作进程共享任务状态"""
+
+    shared = True
+
+    def __init__(self, file: str = None):
+        self._file = file or os.getenv("TASK_STORE_FILE", "cache/tasks.db")
+        self._conn = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """SQLite 连接不能跨进程使用，子进程中重新连接"""
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self._file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self._file, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS task ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at INTEGER NOT NULL)")
+        return self._conn
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def insert(self, task: Dict):
+        self._execute("INSERT OR REPLACE INTO task (id, data, created_at) VALUES (?, ?, ?)",
+                      (task["id"], json.dumps(task, ensure_ascii=False), task["created_at"]))
+
+    def load(self, task_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM task WHERE id = ?", (task_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save(self, task: Dict):
+        self._execute("UPDATE task SET data = ? WHERE id = ?", (json.dumps(task, ensure_ascii=False), task["id"]))
+
+    def delete(self, task_id: str) -> bool:
+        return self._execute("DELETE FROM task WHERE id = ?", (task_id,)) > 0
+
+    def list(self) -> List[Dict]:
+        rows = self._query("SELECT data FROM task ORDER BY created_at")
+        return [json.loads(row[0]) for row in rows]
+
+    def clear(self):
+        self._execute("DELETE FROM task")
+
+
+def create_task_store(name: str = None) -> TaskStore:
+    """按名称创建任务存储，名称默认取环境变量 TASK_STORE：memory（默认）或 sqlite"""
+    name = (name or os.getenv("TASK_STORE", "memory")).lower()
+    if name == "sqlite":
+        return SqliteTaskStore()
+    if name != "memory":
+        logger.warning(f"unknown task store {name}, fallback to memory")
+    return MemoryTaskStore()
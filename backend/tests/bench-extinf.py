@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# EXTINF 解析性能对比：逐行编译正则的旧实现 与 预编译正则 + 单次解析的新实现
+# 用法：在 backend 目录下执行 python tests/bench-extinf.py [行数]
+# re 模块会缓存已编译的正则，旧实现的重复编译开销有限：实测参数解析约 1.0~1.4 倍，
+# 频道名称提取约 1.0~1.25 倍，结果随机器和运行波动，以实际输出为准
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.checker import ChannelChecker  # noqa: E402
+from utils.extinf_util import parse_extinf  # noqa: E402
+
+
+def legacy_parse_extinf_params(content: str):
+    """旧实现：每次调用重新编译参数正则"""
+    params = {}
+    name = ''
+
+    param_str, *name_parts = content.rsplit(',', 1)
+    if name_parts:
+        name = name_parts[0].strip()
+
+    param_pattern = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+    for match in param_pattern.finditer(param_str):
+        params[match.group(1)] = match.group(2)
+
+    return params, name
+
+
+def legacy_extract_from_extinf(m3u8_content):
+    """旧实现：每次调用重新构建名称正则和字符转换表"""
+    extinf_pattern = re.compile(
+        r'^#EXTINF:\s*'
+        r'(?P<duration>-?\d+\.?\d*)\s*'
+        r'(?:tvg-name=(?P<qt1>[\'"]?)(?P<tvg_name>[^\'",#]+?)(?P=qt1)\s*)?'
+        r'(?:,?\s*(?P<display_name>[^#]+?))?'
+        r'\s*(?:#.*)?$',
+        re.IGNORECASE | re.MULTILINE
+    )
+    remove_chars = str.maketrans('', '', ',.，。')
+
+    candidates = []
+    for line in m3u8_content.splitlines():
+        if not line.startswith('#EXTINF'):
+            continue
+        match = extinf_pattern.match(line)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if groups['tvg_name']:
+            clean_name = groups['tvg_name'].strip('\'"')
+            if clean_name:
+                return clean_name
+        if groups['display_name']:
+            display = groups['display_name'].strip()
+            if display.translate(remove_chars):
+                candidates.append(display)
+
+    if candidates:
+        return max(candidates, key=lambda x: len(x))
+    return None
+
+
+def build_extinf_lines(count: int):
+    templates = (
+        '-1 tvg-id="CCTV{i}" tvg-name="CCTV-{i}" tvg-logo="https://logo.example.com/{i}.png" '
+        'group-title="央视频道",CCTV-{i} 综合',
+        '-1 tvg-id="{i}" tvg-name="卫视{i}" group-title="卫视频道" catchup="append" '
+        'catchup-source="?playseek=${{(b)yyyyMMddHHmmss}}",卫视{i}',
+        '-1 tvg-name="\\"quoted\\" {i}" group-title="其他",频道, {i}',
+        '-1,无属性频道{i}',
+    )
+    return [templates[i % len(templates)].format(i=i) for i in range(count)]
+
+
+def build_media_playlists(count: int):
+    return [f"#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-MEDIA-SEQUENCE:{i}\n#EXT-X-TARGETDURATION:6\n"
+            f"#EXTINF:6.0,频道{i}\nseg{i}.ts\n#EXTINF:6.0,频道{i}\nseg{i + 1}.ts\n" for i in range(count)]
+
+
+def bench(name, func, items, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40} {best * 1000:9.1f} ms  {best / len(items) * 1e6:6.2f} us/op")
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lines = build_extinf_lines(count)
+    playlists = build_media_playlists(count // 10)
+    checker = ChannelChecker()
+
+    # 结果一致性校验
+    for line in lines:
+        assert parse_extinf(line) == legacy_parse_extinf_params(line), line
+    for playlist in playlists:
+        assert checker._extract_from_extinf(playlist) == legacy_extract_from_extinf(playlist), playlist
+
+    print(f"EXTINF 参数解析，{count} 行")
+    old = bench("legacy parse_extinf_params", legacy_parse_extinf_params, lines)
+    new = bench("parse_extinf", parse_extinf, lines)
+    print(f"{'speedup':<40} {old / new:9.2f}x\n")
+
+    print(f"媒体播放列表频道名称提取，{len(playlists)} 个")
+    old = bench("legacy _extract_from_extinf", legacy_extract_from_extinf, playlists)
+    new = bench("ChannelChecker._extract_from_extinf", checker._extract_from_extinf, playlists)
+    print(f"{'speedup':<40} {old / new:9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
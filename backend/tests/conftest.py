@@ -0,0 +1,90 @@
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+# 测试使用的缓存文件放在临时目录，需在导入服务模块之前设置
+_CACHE_DIR = tempfile.mkdtemp(prefix="tvbox-tests-")
+os.environ.setdefault("PROBE_CACHE_FILE", os.path.join(_CACHE_DIR, "probe_cache.db"))
+os.environ.setdefault("SOURCE_CACHE_DIR", os.path.join(_CACHE_DIR, "sources"))
+os.environ.setdefault("TASK_STORE_FILE", os.path.join(_CACHE_DIR, "tasks.db"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MEDIA_PLAYLIST = ("#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:10\n#EXT-X-MEDIA-SEQUENCE:1\n"
+                  + "".join(f"#EXTINF:10.0,\nseg{i}.ts\n" for i in range(3)))
+MASTER_PLAYLIST = ("#EXTM3U\n"
+                   "#EXT-X-STREAM-INF:PROGRAM-ID=1, BANDWIDTH=800000, RESOLUTION=640x360\nlow/index.m3u8\n"
+                   "#EXT-X-STREAM-INF:PROGRAM-ID=1, BANDWIDTH=2000000, RESOLUTION=1280x720\nhigh/index.m3u8\n"
+                   "#EXT-X-STREAM-INF:PROGRAM-ID=1, BANDWIDTH=5000000, RESOLUTION=1920x1080\ndead/index.m3u8\n")
+TS_SEGMENT = b"\x47" + b"\x00" * (188 * 512)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    测试用直播源：
+    /live/...m3u8 媒体播放列表，/live/master.m3u8 主播放列表（最高码率的子播放列表不可用），
+    /dead/... 返回 404，/drip/... 声明长度后每 0.2 秒只发送一个字节
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, body: bytes = b""):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.server.hits[path] = self.server.hits.get(path, 0) + 1
+        if path.startswith("/drip/"):
+            self.send_response(200)
+            self.send_header("Content-Length", "100000")
+            self.end_headers()
+            try:
+                for _ in range(100000):
+                    self.wfile.write(b"#")
+                    self.wfile.flush()
+                    time.sleep(0.2)
+            except OSError:
+                pass
+            return
+        if "/dead/" in path or not path.startswith("/live/"):
+            return self._send(404)
+        if path == "/live/master.m3u8":
+            return self._send(200, MASTER_PLAYLIST.encode())
+        if path.endswith(".m3u8"):
+            return self._send(200, MEDIA_PLAYLIST.encode())
+        if path.endswith(".ts"):
+            return self._send(200, TS_SEGMENT)
+        return self._send(404)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture(scope="session")
+def live_server():
+    """本地直播源服务，返回服务对象，base_url 为访问地址，hits 记录各路径的请求次数"""
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.hits = {}
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
@@ -0,0 +1,77 @@
+import pytest
+
+from services import channel_manager
+from utils.parser import Parser
+
+
+@pytest.fixture(autouse=True)
+def empty_channels():
+    channel_manager.clear()
+    yield
+    channel_manager.clear()
+
+
+def _urls(model, group: str, channel_name: str):
+    return {url_info.url: url_info for url_info in model.get_channel_list(group).get_channel(channel_name).urls}
+
+
+def _working_set(text: str, speed: float = 50):
+    working_set = channel_manager.create_working_set()
+    Parser(working_set).load_channel_txt(text)
+    for group in working_set.get_groups():
+        channel_list = working_set.get_channel_list(group)
+        for channel_name in channel_list.get_channel_names():
+            for url_info in channel_list.get_channel(channel_name).urls:
+                url_info.set_speed(speed)
+    return working_set
+
+
+def test_merge_commit_keeps_existing_urls_and_adds_new_ones():
+    Parser().load_channel_txt("央视,#genre#\n甲台,http://x/a\n乙台,http://x/b\n")
+
+    channel_manager.commit(_working_set("央视,#genre#\n甲台,http://x/c\n丙台,http://x/d\n"), replace=False)
+
+    assert set(_urls(channel_manager, "央视", "甲台")) == {"http://x/a", "http://x/c"}
+    assert set(_urls(channel_manager, "央视", "乙台")) == {"http://x/b"}
+    assert set(_urls(channel_manager, "央视", "丙台")) == {"http://x/d"}
+
+
+def test_merge_commit_applies_new_results_to_the_live_url_instance():
+    Parser().load_channel_txt("央视,#genre#\n甲台,http://x/a\n乙台,http://x/b\n")
+    live_b = _urls(channel_manager, "央视", "乙台")["http://x/b"]
+    live_b.set_speed(1)
+
+    channel_manager.commit(_working_set("央视,#genre#\n甲台,http://x/b\n"), replace=False)
+
+    # 同一地址在频道集中只有一个实例，检测结果对包含该地址的所有频道生效
+    merged_b = _urls(channel_manager, "央视", "甲台")["http://x/b"]
+    assert merged_b is live_b
+    assert live_b.speed == 50
+    assert channel_manager._urls.intern("http://x/b") is live_b
+
+
+def test_replace_commit_swaps_channels_and_url_registry():
+    Parser().load_channel_txt("央视,#genre#\n甲台,http://x/a\n")
+    working_set = _working_set("央视,#genre#\n乙台,http://x/b\n")
+
+    channel_manager.commit(working_set, replace=True)
+
+    assert list(channel_manager.get_channel_list("央视").get_channel_names()) == ["乙台"]
+    assert channel_manager._urls is working_set._urls
+
+
+def test_merge_commit_unions_published_results():
+    Parser().load_channel_txt("央视,#genre#\n甲台,http://x/a\n")
+    channel_manager.publish()
+    working_set = _working_set("央视,#genre#\n乙台,http://x/b\n")
+    working_set.publish()
+
+    channel_manager.commit(working_set, replace=False)
+    assert channel_manager.published_result("http://x/a") is not None
+    assert channel_manager.published_result("http://x/b") == (50, None)
+
+    working_set = _working_set("央视,#genre#\n丙台,http://x/c\n")
+    working_set.publish()
+    channel_manager.commit(working_set, replace=True)
+    assert channel_manager.published_result("http://x/a") is None
+    assert channel_manager.published_result("http://x/c") is not None
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from core.deadline import Deadline, TimeoutException
+from core.http_pool import http_pool
+from models.channel_info import ChannelInfo, ChannelUrl
+from services.checker import ChannelChecker, parse_variants
+from services.probe_cache import probe_cache
+
+
+def _url(base_url: str, path: str):
+    channel_info = ChannelInfo("1", "测试台")
+    url_info = ChannelUrl(base_url + path)
+    channel_info.add_url(url_info)
+    return channel_info, url_info
+
+
+def test_parse_variants_ranks_by_bandwidth_with_spaced_attributes():
+    content = ("#EXTM3U\n"
+               "#EXT-X-STREAM-INF:PROGRAM-ID=1, BANDWIDTH=800000, RESOLUTION=640x360\nlow.m3u8\n"
+               "#EXT-X-STREAM-INF:PROGRAM-ID=1, AVERAGE-BANDWIDTH=9000000, BANDWIDTH=2000000\nhigh.m3u8\n"
+               "#EXT-X-STREAM-INF:RESOLUTION=1920x1080\nnobw.m3u8\n")
+    assert parse_variants(content, "http://example.com/live/master.m3u8") == [
+        "http://example.com/live/high.m3u8",
+        "http://example.com/live/low.m3u8",
+        "http://example.com/live/nobw.m3u8",
+    ]
+
+
+def test_parse_variants_breaks_ties_by_resolution_then_order():
+    content = ("#EXTM3U\n"
+               "#EXT-X-STREAM-INF:BANDWIDTH=1000,RESOLUTION=640x360\na.m3u8\n"
+               "#EXT-X-STREAM-INF:BANDWIDTH=1000,RESOLUTION=1280x720\nb.m3u8\n"
+               "#EXT-X-STREAM-INF:BANDWIDTH=1000,RESOLUTION=640x360\nhttp://cdn.example.com/c.m3u8\n")
+    assert parse_variants(content, "http://example.com/master.m3u8") == [
+        "http://example.com/b.m3u8",
+        "http://example.com/a.m3u8",
+        "http://cdn.example.com/c.m3u8",
+    ]
+
+
+def test_master_playlist_resolves_best_available_variant(live_server):
+    channel_info, url_info = _url(live_server.base_url, "/live/master.m3u8")
+
+    assert ChannelChecker(use_cache=False).check_single_with_timeout(channel_info, url_info, True, timeout=10)
+    # 最高码率的子播放列表不可用，选择次高的子播放列表，原地址保持不变
+    assert url_info.url == live_server.base_url + "/live/master.m3u8"
+    assert url_info.resolved_url == live_server.base_url + "/live/high/index.m3u8"
+
+
+def test_iter_body_stops_trickling_response_at_deadline(live_server):
+    deadline = Deadline(1)
+    started = time.monotonic()
+    with http_pool.session().get(live_server.base_url + "/drip/index.m3u8", stream=True, timeout=5) as response:
+        with pytest.raises(TimeoutException):
+            for _ in ChannelChecker._iter_body(response, deadline, 8192):
+                pass
+    assert time.monotonic() - started < 2
+
+
+def test_check_times_out_on_trickling_playlist_and_is_not_cached(live_server):
+    channel_info, url_info = _url(live_server.base_url, "/drip/index.m3u8")
+
+    started = time.monotonic()
+    assert not ChannelChecker().check_single_with_timeout(channel_info, url_info, True, timeout=1.5)
+    assert time.monotonic() - started < 3
+    # 超时不代表地址无效，不写入检测结果缓存
+    assert probe_cache.get(url_info.url) is None
+
+
+def test_probe_cache_hit_skips_network_and_miss_probes(live_server):
+    path = "/live/cached/index.m3u8"
+    channel_info, url_info = _url(live_server.base_url, path)
+    probe_cache.clear()
+
+    assert ChannelChecker().check_single_with_timeout(channel_info, url_info, True, timeout=10)
+    hits = live_server.hits[path]
+    cached = probe_cache.get(url_info.url)
+    assert cached is not None and cached.valid
+
+    channel_info, url_info = _url(live_server.base_url, path)
+    assert ChannelChecker().check_single_with_timeout(channel_info, url_info, True, timeout=10)
+    assert live_server.hits[path] == hits
+    assert url_info.speed == cached.speed
+
+    # 不使用缓存时重新检测
+    channel_info, url_info = _url(live_server.base_url, path)
+    assert ChannelChecker(use_cache=False).check_single_with_timeout(channel_info, url_info, True, timeout=10)
+    assert live_server.hits[path] == hits + 1
+
+
+def test_cached_invalid_result_is_returned_without_probe(live_server):
+    path = "/live/flagged/index.m3u8"
+    channel_info, url_info = _url(live_server.base_url, path)
+    probe_cache.put(url_info.url, False)
+
+    assert not ChannelChecker().check_single_with_timeout(channel_info, url_info, True, timeout=10)
+    assert path not in live_server.hits
@@ -0,0 +1,74 @@
+import pytest
+
+from services.probe_cache import probe_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    probe_cache.clear()
+    yield
+    probe_cache.clear()
+
+
+def _reload():
+    """模拟进程重启：丢弃内存中的结果表，下次查询时从数据库重新载入"""
+    probe_cache._reset_after_fork()
+
+
+def test_miss_then_hit():
+    assert probe_cache.get("http://example.com/a.m3u8") is None
+
+    probe_cache.put("http://example.com/a.m3u8", True, 12.5, "http://example.com/a/high.m3u8")
+    cached = probe_cache.get("http://example.com/a.m3u8")
+    assert cached.valid
+    assert cached.speed == 12.5
+    assert cached.resolved_url == "http://example.com/a/high.m3u8"
+
+
+def test_flushed_results_survive_reload():
+    probe_cache.put("http://example.com/valid.m3u8", True, 3.0)
+    probe_cache.put("http://example.com/invalid.m3u8", False)
+    probe_cache.flush()
+    _reload()
+
+    assert probe_cache.get("http://example.com/valid.m3u8").speed == 3.0
+    assert not probe_cache.get("http://example.com/invalid.m3u8").valid
+
+
+def test_unflushed_results_are_not_persisted():
+    probe_cache.put("http://example.com/pending.m3u8", True, 1.0)
+    _reload()
+
+    assert probe_cache.get("http://example.com/pending.m3u8") is None
+
+
+def test_expired_result_is_a_miss(monkeypatch):
+    probe_cache.put("http://example.com/valid.m3u8", True, 1.0)
+    probe_cache.put("http://example.com/invalid.m3u8", False)
+    # 无效结果的过期时间更短
+    monkeypatch.setattr(probe_cache, "_invalid_ttl", -1)
+
+    assert probe_cache.get("http://example.com/valid.m3u8") is not None
+    assert probe_cache.get("http://example.com/invalid.m3u8") is None
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(probe_cache, "_max_entries", 2)
+    probe_cache.put("http://example.com/1.m3u8", True, 1.0)
+    probe_cache.put("http://example.com/2.m3u8", True, 1.0)
+    probe_cache.get("http://example.com/1.m3u8")
+    probe_cache.put("http://example.com/3.m3u8", True, 1.0)
+
+    assert probe_cache.get("http://example.com/2.m3u8") is None
+    assert probe_cache.get("http://example.com/1.m3u8") is not None
+    assert probe_cache.get("http://example.com/3.m3u8") is not None
+
+
+def test_clear_removes_memory_and_database_entries():
+    probe_cache.put("http://example.com/a.m3u8", True, 1.0)
+    probe_cache.flush()
+
+    assert probe_cache.clear() == 1
+    assert probe_cache.get("http://example.com/a.m3u8") is None
+    _reload()
+    assert probe_cache.get("http://example.com/a.m3u8") is None
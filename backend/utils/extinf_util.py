@@ -0,0 +1,14 @@
+from typing import Dict, Tuple
+
+from core.patterns import EXTINF_PARAM_PATTERN
+
+
+def parse_extinf(content: str) -> Tuple[Dict[str, str], str]:
+    """
+    一次性解析EXTINF标签内容（#EXTINF: 之后的部分），返回 (参数, 频道名称)
+    最后一个逗号之后为频道名称，之前的部分按 key="value" 提取参数，重复的参数以最后一个为准
+    """
+    comma = content.rfind(',')
+    if comma < 0:
+        return dict(EXTINF_PARAM_PATTERN.findall(content)), ''
+    return dict(EXTINF_PARAM_PATTERN.findall(content, 0, comma)), content[comma + 1:].strip()
@@ -1,18 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, List
+
 import requests
 from bs4 import BeautifulSoup
 
-from api.tv.converter import LiveConverter
 from core.constants import Constants
+from core.http_pool import http_pool
 from core.logger_factory import LoggerFactory
 from services import channel_manager, category_manager
+from services.channel import ChannelBaseModel
 from services.const import Const
+from services.source_cache import source_cache
+from utils.extinf_util import parse_extinf
 
 logger = LoggerFactory.get_logger(__name__)
 
 
+class _SourceStats:
+    """单个直播源的下载解析耗时统计"""
+
+    __slots__ = ("started", "fetch_time", "lines")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.fetch_time = 0.0
+        self.lines = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def parse_time(self) -> float:
+        return max(0.0, self.elapsed - self.fetch_time)
+
+
 class Parser:
     _live_url = "http://107.174.95.154/tvbox/json/live.txt"
 
+    def __init__(self, model: ChannelBaseModel = None):
+        # 解析出的频道写入的频道集，默认为当前频道集
+        self._model = model or channel_manager
+
     @staticmethod
     def get_channel_data(text_data: str) -> list:
         """
@@ -48,35 +78,135 @@ class Parser:
 
     def load_remote_sitemap(cls, url: str):
         try:
-            response = requests.get(url, timeout=Constants.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'xml')
-            for loc in soup.find_all('loc'):
-                url = loc.text.strip()
-                if not url.endswith("iptv4.txt"):
-                    continue
-                cls.load_remote_url_txt(url, True)
+            soup = BeautifulSoup(cls._fetch_text(url), 'xml')
+            source_urls = [loc.text.strip() for loc in soup.find_all('loc')]
+            source_urls = [source_url for source_url in source_urls if source_url.endswith("iptv4.txt")]
 
-            # 处理自建频道
-            cls.load_remote_url_txt(cls._live_url)
-            channel_manager.sort()
+            # 各直播源并发下载，先响应的先解析入库；自建频道同时下载
+            with ThreadPoolExecutor(max_workers=Constants.SOURCE_FETCH_WORKERS) as executor:
+                futures = [executor.submit(cls.load_remote_url_txt, source_url, True) for source_url in source_urls]
+                futures.append(executor.submit(cls.load_remote_url_txt, cls._live_url))
+                for future in as_completed(futures):
+                    future.result()
+
+            cls._model.sort()
         except Exception as e:
             logger.error(f"parse sitemap data failed: {e}")
 
-    def load_remote_url_txt(cls, url, use_ignore=False):
+    def _fetch_text(cls, url: str) -> str:
+        """条件请求下载文本，未变更或上游不可访问时使用缓存内容"""
         try:
-            response = requests.get(url, timeout=Constants.REQUEST_TIMEOUT)
+            response = http_pool.session().get(url, timeout=Constants.REQUEST_TIMEOUT,
+                                              headers=source_cache.request_headers(url))
+            if response.status_code == 304:
+                cached_text = source_cache.load(url)
+                if cached_text is None:
+                    raise requests.HTTPError(f"{url} not modified but cached copy is missing", response=response)
+                return cached_text
             response.raise_for_status()
-            cls.load_channel_txt(response.text.strip(), use_ignore)
+            source_cache.store(url, response.headers, response.encoding or response.apparent_encoding,
+                               response.content)
+            return response.text
+        except requests.RequestException as e:
+            cached_text = source_cache.load(url)
+            if cached_text is None:
+                raise
+            logger.warning(f"access remote url {url} failed: {e}, use cached copy")
+            return cached_text
+
+    def load_remote_url_txt(cls, url, use_ignore=False):
+        try:
+            cls._load_source(url, f"txt:{use_ignore}",
+                             lambda lines: cls._parse_channel_lines(lines, use_ignore),
+                             cls._add_channel_record)
         except Exception as e:
             logger.error(f"access remote url data failed: {e}")
 
+    def _load_source(cls, url: str, kind: str,
+                     parse: Callable[[Iterable[str]], Iterator[tuple]], apply: Callable[[tuple], None]):
+        """
+        下载并解析直播源，边下载边解析，完整读取后频道记录统一入库；读取中途失败时不会留下部分记录
+        1. 携带缓存的 ETag/Last-Modified 发起条件请求，304 时复用上次的解析结果
+        2. 上游不可访问时回退到最近一次成功下载的内容
+        """
+        stats = _SourceStats()
+        try:
+            with http_pool.session().get(url, stream=True, headers=source_cache.request_headers(url),
+                                        timeout=(Constants.REQUEST_TIMEOUT, Constants.SOURCE_READ_TIMEOUT)) as response:
+                if response.status_code == 304:
+                    if cls._replay_source(url, kind, parse, apply):
+                        logger.info(f"load source {url}: not modified, reuse cached channels")
+                        return
+                    raise requests.HTTPError(f"{url} not modified but cached copy is missing", response=response)
+                response.raise_for_status()
+                stats.fetch_time = stats.elapsed
+
+                body: List[bytes] = []
+                records = list(parse(cls._stream_lines(response, stats, body)))
+                source_cache.store(url, response.headers, response.encoding, b"\n".join(body))
+                source_cache.put_records(url, kind, records)
+            for record in records:
+                apply(record)
+            logger.info(f"load source {url}: {stats.lines} lines, "
+                        f"fetch {stats.fetch_time:.2f}s, parse {stats.parse_time:.2f}s")
+        except requests.RequestException as e:
+            if not cls._replay_source(url, kind, parse, apply):
+                raise
+            logger.warning(f"access remote url {url} failed: {e}, use cached copy")
+
+    @staticmethod
+    def _replay_source(url: str, kind: str,
+                       parse: Callable[[Iterable[str]], Iterator[tuple]], apply: Callable[[tuple], None]) -> bool:
+        """使用缓存的解析结果入库，没有解析结果时解析缓存的文件内容"""
+        records = source_cache.get_records(url, kind)
+        if records is None:
+            cached_text = source_cache.load(url)
+            if cached_text is None:
+                return False
+            records = list(parse(cached_text.splitlines()))
+            source_cache.put_records(url, kind, records)
+
+        for record in records:
+            apply(record)
+        return True
+
+    @staticmethod
+    def _stream_lines(response: requests.Response, stats: _SourceStats, body: List[bytes]) -> Iterator[str]:
+        """
+        逐行读取响应内容，边下载边解析，原始内容同时写入 body 用于缓存
+        等待网络数据的时间计入下载耗时，超过单个直播源的总时长上限时抛出超时异常
+        """
+        encoding = response.encoding or 'utf-8'
+        lines = response.iter_lines()
+        while True:
+            started = time.perf_counter()
+            line = next(lines, None)
+            stats.fetch_time += time.perf_counter() - started
+            if line is None:
+                return
+            if stats.elapsed > Constants.SOURCE_FETCH_TIMEOUT:
+                raise requests.Timeout(f"source download exceeded {Constants.SOURCE_FETCH_TIMEOUT}s")
+            stats.lines += 1
+            body.append(line)
+            yield line.decode(encoding, errors='replace')
+
+    def load_channel_txt(cls, text_data, use_ignore: bool = False):
+        cls.load_channel_lines(text_data.splitlines(), use_ignore)
+
+    def load_channel_lines(cls, lines: Iterable[str], use_ignore: bool = False):
+        for record in cls._parse_channel_lines(lines, use_ignore):
+            cls._add_channel_record(record)
+
+    def _add_channel_record(cls, record: tuple):
+        cls._model.add_channel(*record)
+
     @staticmethod
-    def load_channel_txt(text_data, use_ignore: bool = False):
+    def _parse_channel_lines(lines: Iterable[str], use_ignore: bool = False) -> Iterator[tuple]:
+        """解析TXT格式的频道数据，生成 (分类, 频道名称, URL) 记录"""
         from services import category_manager
 
         category_name = None
-        for line in (line.strip() for line in text_data.splitlines() if line.strip() and not line.startswith('#')):
+        for line in (line.strip() for line in lines if line.strip() and not line.startswith('#')):
             if line.endswith('#genre#'):
                 category_name = None
                 parse_category = Constants.CATEGORY_CLEAN_PATTERN.sub(' ', line).strip()
@@ -94,43 +224,48 @@ class Parser:
                     subgenre, url = subgenre.strip(), url.strip()
                     channel_name = Const.get_channel(subgenre)
                     if url:
-                        channel_manager.add_channel(category_name, channel_name, url)
+                        yield category_name, channel_name, url
                 except ValueError:
                     continue
 
     def load_remote_url_m3u(cls, url: str):
         try:
-            response = requests.get(url, timeout=Constants.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            m3u_data = response.text.strip()
-
-            tvg_id = ''
-            tvg_logo = ''
-            group_title = ''
-            channel_name = None
-            for line in (line.strip() for line in m3u_data.splitlines() if line.strip()):
-                if line.startswith('#EXTM3U'):
-                    continue
-
-                if line.startswith('#EXTINF:'):
-                    tag_content = line[8:].strip()
-                    params, name = LiveConverter.parse_extinf_params(tag_content)
-                    channel_name = Const.get_channel(name)
-                    tvg_id = Const.get_channel(params.get('id', ''))
-                    tvg_logo = params.get('logo', '')
-                    group_title = params.get('title', '')
-
-                elif line.startswith(('http:', 'https:')):
-                    define_category = Const.get_category(group_title)
-                    if (define_category is None
-                            or (category_manager.is_ignore(define_category))
-                            or not category_manager.exists(define_category)):
-                        continue
-                    tvg_new_logo = channel_manager.epg.get_logo(tvg_logo)
-                    channel_manager.add_channel(define_category, channel_name, line, tvg_id, tvg_new_logo)
+            cls._load_source(url, "m3u", cls._parse_m3u_lines, cls._add_m3u_record)
 
             # 处理自建频道
             cls.load_remote_url_txt(cls._live_url)
-            channel_manager.sort()
+            cls._model.sort()
         except Exception as e:
             logger.error(f"parse m3u data failed: {e}")
+
+    def _add_m3u_record(cls, record: tuple):
+        define_category, channel_name, url, tvg_id, tvg_logo = record
+        tvg_new_logo = cls._model.epg.get_logo(tvg_logo)
+        cls._model.add_channel(define_category, channel_name, url, tvg_id, tvg_new_logo)
+
+    @staticmethod
+    def _parse_m3u_lines(lines: Iterable[str]) -> Iterator[tuple]:
+        """解析M3U格式的频道数据，生成 (分类, 频道名称, URL, 频道ID, 台标) 记录"""
+        tvg_id = ''
+        tvg_logo = ''
+        group_title = ''
+        channel_name = None
+        for line in (line.strip() for line in lines if line.strip()):
+            if line.startswith('#EXTM3U'):
+                continue
+
+            if line.startswith('#EXTINF:'):
+                tag_content = line[8:].strip()
+                params, name = parse_extinf(tag_content)
+                channel_name = Const.get_channel(name)
+                tvg_id = Const.get_channel(params.get('id', ''))
+                tvg_logo = params.get('logo', '')
+                group_title = params.get('title', '')
+
+            elif line.startswith(('http:', 'https:')):
+                define_category = Const.get_category(group_title)
+                if (define_category is None
+                        or (category_manager.is_ignore(define_category))
+                        or not category_manager.exists(define_category)):
+                    continue
+                yield define_category, channel_name, line, tvg_id, tvg_logo
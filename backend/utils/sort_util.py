@@ -1,8 +1,55 @@
 import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
 
 from pypinyin import pinyin, Style
 
+from core.constants import Constants
 
+_T = TypeVar("_T")
+
+# 排序键正则模式：字母/符号、数字、汉字
+_SORT_KEY_PATTERN = re.compile(r'([a-zA-Z]+|[^\w\s]+)|(\d+)|([\u4e00-\u9fa5]+)')
+_CHINESE_PATTERN = re.compile(r'[\u4e00-\u9fa5]')
+
+# 单字拼音表：只收录读音唯一的汉字，多音字记为 None，需结合词组上下文转换
+_pinyin_table: Dict[str, Optional[str]] = {}
+
+
+def _char_pinyin(char: str) -> Optional[str]:
+    """查询单字拼音，多音字返回 None"""
+    if char in _pinyin_table:
+        return _pinyin_table[char]
+
+    readings = {reading.lower() for reading in pinyin(char, style=Style.NORMAL, heteronym=True, strict=False)[0]}
+    reading = readings.pop() if len(readings) == 1 else None
+    _pinyin_table[char] = reading
+    return reading
+
+
+@lru_cache(maxsize=Constants.SORT_KEY_CACHE_SIZE)
+def _phrase_pinyin(chinese_part: str) -> str:
+    """按词组转换拼音，用于包含多音字的汉字片段"""
+    pinyin_list = pinyin(chinese_part, style=Style.NORMAL, strict=False)
+    return ''.join([p[0].lower() for p in pinyin_list])
+
+
+def _chinese_pinyin(chinese_part: str) -> str:
+    readings = [_char_pinyin(char) for char in chinese_part]
+    if None in readings:
+        return _phrase_pinyin(chinese_part)
+    return ''.join(readings)
+
+
+def warm_pinyin(texts: Iterable[str]) -> int:
+    """预热单字拼音表，返回表中已收录的汉字数量"""
+    for text in texts:
+        for char in _CHINESE_PATTERN.findall(text or ''):
+            _char_pinyin(char)
+    return len(_pinyin_table)
+
+
+@lru_cache(maxsize=Constants.SORT_KEY_CACHE_SIZE)
 def mixed_sort_key(s):
     """
     混合排序键：同时支持数字自然排序和汉字拼音排序
@@ -10,11 +57,9 @@ def mixed_sort_key(s):
     2. 按数字大小（自然排序）
     3. 按汉字拼音（小写）
     """
-    # 定义正则模式：字母/符号、数字、汉字
-    pattern = re.compile(r'([a-zA-Z]+|[^\w\s]+)|(\d+)|([\u4e00-\u9fa5]+)')
     key_parts = []
 
-    for match in pattern.finditer(s):
+    for match in _SORT_KEY_PATTERN.finditer(s):
         alpha_part, num_part, chinese_part = match.groups()
 
         if alpha_part:
@@ -24,10 +69,15 @@ def mixed_sort_key(s):
             # 数字部分：转为整数
             key_parts.append(('n', int(num_part)))
         elif chinese_part:
-            # 汉字部分：转换为拼音列表
-            pinyin_list = pinyin(chinese_part, style=Style.NORMAL, strict=False)
-            # 拼接拼音并转小写
-            pinyin_str = ''.join([p[0].lower() for p in pinyin_list])
-            key_parts.append(('c', pinyin_str))
+            # 汉字部分：转换为拼音
+            key_parts.append(('c', _chinese_pinyin(chinese_part)))
 
     return tuple(key_parts)
+
+
+def sort_channels(channels: Iterable[_T], key: Callable[[_T], str] = lambda channel: channel.name) -> List[_T]:
+    """
+    按名称的混合排序键批量排序，排序键经 mixed_sort_key 缓存，已出现过的名称不会重新计算
+    ChannelList 新增频道时按同一排序键增量维护顺序，批量排序的结果与之一致
+    """
+    return sorted(channels, key=lambda channel: mixed_sort_key(key(channel)))
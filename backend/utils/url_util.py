@@ -1,3 +1,4 @@
+from typing import Optional
 from urllib.parse import unquote, quote
 
 from core.logger_factory import LoggerFactory
@@ -40,3 +41,18 @@ def url_decode(encoded_text: str) -> str:
     except Exception as e:
         logger.error(f"error: URL decoding failed - {str(e)}")
         raise Exception(f"URL decoding failed - {str(e)}")
+
+
+def extract_host(url: str) -> Optional[str]:
+    """
+    从URL中提取主机部分（IP或域名+端口）
+
+    参数:
+        url (str): 完整的URL地址
+    返回:
+        Optional[str]: 主机部分，无法解析时返回 None
+    """
+    try:
+        return url.split("//")[1].split("/")[0]
+    except IndexError:
+        return None